@@ -0,0 +1,502 @@
+
+# This program is used to calculate the green view index based on the collecte metadata. The
+# Object based images classification algorithm is used to classify the greenery from the GSV imgs
+# in this code, the meanshift algorithm implemented by pymeanshift was used to segment image
+# first, based on the segmented image, we further use the Otsu's method to find threshold from
+# ExG image to extract the greenery pixels.
+
+# For more details about the object based image classification algorithm
+# check: Li et al., 2016, Who lives in greener neighborhoods? the
+# distribution of street greenery and it association with residents'
+# socioeconomic conditions in Hartford, Connectictu, USA
+
+# This program implementing OTSU algorithm to chose the threshold automatically
+# For more details about the OTSU algorithm and python implmentation
+# cite:
+# http://docs.opencv.org/trunk/doc/py_tutorials/py_imgproc/py_thresholding/py_thresholding.html
+
+
+# Copyright(C) Xiaojiang Li, Ian Seiferling, Marwa Abdulhai, Senseable City Lab, MIT
+# First version June 18, 2014
+
+import os
+import os.path
+import time
+from PIL import Image
+import numpy as np
+import sys
+from urllib.parse import urlencode
+
+from . import config
+
+# the six horizontal directions of the GSV images used for a panorama, in the
+# original Green View paper 18 images were used, 6 images at different
+# horizontal directions should be good
+HEADINGS = 360 / 6 * np.array([0, 1, 2, 3, 4, 5])
+PITCH = 0
+
+# the green view of the panoramas whose images could not be retreived or
+# classified, written in the results and skipped by Greenview2Shp
+FAILED_GREEN_VIEW = -1000 / float(len(HEADINGS))
+
+# the full size of the GSV images in pixels, smaller sizes are set with
+# config.IMG_SIZE, and calibrated with calibration.py
+FULL_SIZE = 400
+
+
+def graythresh(array, level, weights=None):
+    '''array: is the numpy array waiting for processing
+    weights: the number of pixels of each value of array, when array only
+    holds the distinct values of an image
+    return thresh: is the result got by OTSU algorithm
+    if the threshold is less than level, then set the level as the threshold
+    by Xiaojiang Li
+    '''
+
+    np.seterr(divide='ignore', invalid='ignore')
+
+    maxVal = np.max(array)
+    minVal = np.min(array)
+
+    # if the inputImage is a float of double dataset then we transform the data
+    # in to byte and range from [0 255]
+    if maxVal <= 1:
+        array = array * 255
+    elif maxVal >= 256:
+        array = (array - minVal) * 255.0 / (maxVal - minVal)
+
+    # turn the negative to natural number
+    array = np.maximum(array, 0)
+
+    # calculate the hist of 'array', the bin k holds the values in [k, k+1[,
+    # and the last bin also holds 256, like np.histogram(array, range(257))
+    inRange = array <= 256
+    bins = np.minimum(np.floor(array[inRange]).astype(np.intp), 255)
+    if weights is not None:
+        weights = np.asarray(weights, dtype=np.float64)[inRange]
+    hist = np.bincount(bins, weights=weights, minlength=256)
+    P_hist = hist * 1.0 / np.sum(hist)
+
+    omega = P_hist.cumsum()
+
+    temp = np.arange(256)
+    mu = P_hist * (temp + 1)
+    mu = mu.cumsum()
+
+    n = len(mu)
+    mu_t = mu[n - 1]
+
+    sigma_b_squared = (mu_t * omega - mu)**2 / (omega * (1 - omega))
+
+    # try to found if all sigma_b squrered are NaN or Infinity
+    indInf = np.where(sigma_b_squared == np.inf)
+
+    CIN = 0
+    if len(indInf[0]) > 0:
+        CIN = len(indInf[0])
+
+    maxval = np.max(sigma_b_squared)
+
+    IsAllInf = CIN == 256
+    if IsAllInf != 1:
+        index = np.where(sigma_b_squared == maxval)
+        idx = np.mean(index)
+        threshold = (idx - 1) / 255.0
+    else:
+        threshold = level
+
+    if np.isnan(threshold):
+        threshold = level
+
+    return threshold
+
+
+def VegetationClassification(Img):
+    '''
+    This function is used to classify the green vegetation from GSV image,
+    This is based on object based and otsu automatically thresholding method
+    The season of GSV images were also considered in this function
+        Img: the numpy array image, eg. Img = np.array(Image.open(StringIO(response.content)))
+        return the percentage of the green vegetation pixels in the GSV image
+
+    By Xiaojiang Li
+    '''
+
+    import pymeanshift as pms
+
+    # the parameters of the segmentation were chosen for 400x400 images, the
+    # spatial radius and the minimum region area follow the image size
+    scale = Img.shape[1] / float(FULL_SIZE)
+    spatial_radius = max(1, int(round(6 * scale)))
+    min_density = max(1, int(round(40 * scale * scale)))
+
+    # use the meanshift segmentation algorithm to segment the original GSV
+    # image
+    (segmented_image, labels_image, number_regions) = pms.segment(
+        Img, spatial_radius=spatial_radius, range_radius=7, min_density=min_density)
+    del labels_image
+
+    return green_percent_of_segmented(segmented_image)
+
+
+def green_percent_of_segmented(segmented_image):
+    '''
+    This function is used to compute the percentage of the green vegetation
+    pixels of the segmented GSV image. The segmented image only has a few
+    distinct colours, one per region, so the image is reduced to its colours
+    and their number of pixels, and the classification is computed for the
+    colours instead of the pixels. The only full size array is an int32 copy
+    of the image, and the percentage is the same as the one of the per pixel
+    computation of the original implementation (see benchmark.py).
+
+        segmented_image: the uint8 RGB image segmented by pymeanshift
+        return the percentage of the green vegetation pixels
+    '''
+
+    # pack the three bands of every pixel in one integer and count the pixels
+    # of every colour
+    colours = segmented_image[:, :, 0].astype(np.int32)
+    colours <<= 8
+    colours |= segmented_image[:, :, 1]
+    colours <<= 8
+    colours |= segmented_image[:, :, 2]
+    colours, counts = np.unique(colours, return_counts=True)
+
+    red = (colours >> 16) / 255.0
+    green = ((colours >> 8) & 255) / 255.0
+    blue = (colours & 255) / 255.0
+
+    # calculate the difference between green band with other two bands
+    ExG = (green - red) + (green - blue)
+
+    greenImg1 = (red < 0.6) & (green < 0.9) & (blue < 0.6)
+    greenImgShadow1 = (red < 0.3) & (green < 0.3) & (blue < 0.3)
+
+    threshold = graythresh(ExG, 0.1, counts)
+
+    if threshold > 0.1:
+        threshold = 0.1
+    elif threshold < 0.05:
+        threshold = 0.05
+
+    greenColours = (greenImg1 & (ExG > threshold)) | (greenImgShadow1 & (ExG > 0.05))
+
+    # calculate the percentage of the green vegetation
+    greenPxlNum = int(counts[greenColours].sum())
+    return greenPxlNum / (segmented_image.shape[0] * segmented_image.shape[1]) * 100
+
+
+# using 18 directions is too time consuming, therefore, here I only use 6 horizontal directions
+# Each time the function will read a text, with 1000 records, and save the
+# result as a single TXT
+def GreenViewComputing_ogr_6Horizon(GSVinfoFolder, outTXTRoot, greenmonth, size=None):
+    """
+    This function is used to download the GSV from the information provide
+    by the gsv info txt, and save the result to a shapefile
+
+    Required modules: numpy, requests, and PIL
+
+        GSVinfoTxt: the input folder name of GSV info txt
+        outTXTRoot: the output folder to store result green result in txt files
+        greenmonth: a list of the green season, greenmonth = ['05','06','07','08','09']
+        size: the size of the images in pixels, config.IMG_SIZE by default
+
+    """
+
+    # read the Google Street View API key files, you can also replace these
+    # keys by your own
+
+    # create a folder for GSV images and grenView Info
+    if not os.path.exists(outTXTRoot):
+        os.makedirs(outTXTRoot)
+
+    # the input GSV info should be in a folder
+    if not os.path.isdir(GSVinfoFolder):
+        print('You should input a folder for GSV metadata')
+        return
+    else:
+        allTxtFiles = os.listdir(GSVinfoFolder)
+        for txtfile in allTxtFiles:
+            if not txtfile.endswith('.txt'):
+                continue
+
+            txtfilename = os.path.join(GSVinfoFolder, txtfile)
+            panoIDLst, panoDateLst, panoLonLst, panoLatLst = get_pano_lists_from_file(
+                txtfilename, greenmonth)
+
+            # the output text file to store the green view and pano info, the
+            # size is in the name of the results of the smaller images
+            gvTxt = get_result_name(txtfile, config.IMG_SIZE if size is None else size)
+            GreenViewTxtFile = os.path.join(outTXTRoot, gvTxt)
+
+            # check whether the file already generated, if yes, skip.
+            # Therefore, you can run several process at same time using this
+            # code.
+            print("Processing", GreenViewTxtFile)
+            if os.path.exists(GreenViewTxtFile):
+                print("File already exists")
+                continue
+
+            # write the green view and pano info to txt
+            with open(GreenViewTxtFile, "w") as gvResTxt:
+                for i in range(len(panoIDLst)):
+                    panoDate = panoDateLst[i]
+                    panoID = panoIDLst[i]
+                    lat = panoLatLst[i]
+                    lon = panoLonLst[i]
+
+                    # calculate the green view index, using different keys
+                    # for different process, each key can only request
+                    # 25,000 imgs every 24 hours
+                    greenViewVal = compute_pano_green_view(panoID, size)
+                    print(
+                        'The greenview: %s, pano: %s, (%s, %s)' %
+                        (greenViewVal, panoID, lat, lon))
+
+                    # write the result and the pano info to the result txt file
+                    lineTxt = format_result_line(panoID, panoDate, lon, lat, greenViewVal)
+                    gvResTxt.write(lineTxt)
+
+
+def get_result_name(txtfile, size=FULL_SIZE):
+    ''' Return the name of the result txt file of a metadata txt file '''
+
+    if size == FULL_SIZE:
+        return 'GV_' + os.path.basename(txtfile)
+    return 'GV_%spx_' % size + os.path.basename(txtfile)
+
+
+def retreive_pano_images(panoID, headingArr, pitch, size=None):
+    ''' Retreive the GSV images of a panorama for all the headings, from the
+    local image folder or from the API, or rendered from the full panorama
+    with config.ACQUISITION = 'panorama' '''
+
+    if size is None:
+        size = config.IMG_SIZE
+
+    # render the views from the full panorama, one download for all headings
+    if config.ACQUISITION == 'panorama':
+        from .panorama import render_pano_views
+        return render_pano_views(panoID, headingArr, pitch, size)
+
+    images = []
+    for heading in headingArr:
+        print("Heading is: ", heading)
+        URL = get_api_url(panoID, heading, pitch, size)
+        images.append(retreive_image(URL, panoID, heading, size))
+
+    return images
+
+
+def green_percent_of_images(images):
+    ''' Return the sum of the green vegetation percentages of the images '''
+
+    greenPercent = 0.0
+    for im in images:
+        greenPercent = greenPercent + VegetationClassification(im)
+
+    return greenPercent
+
+
+def compute_pano_green_view(panoID, size=None, images=None):
+    '''
+    This function is used to compute the green view index of a panorama, the
+    mean green vegetation percentage of its images at the six headings. All
+    the modes compute the green view of a panorama with this function.
+
+    Parameters:
+        panoID: the id of the panorama
+        size: the size of the images in pixels, config.IMG_SIZE by default
+        images: the images of the panorama when they were already retreived,
+            retreived by retreive_pano_images otherwise
+
+    Return:
+        the green view index, or FAILED_GREEN_VIEW when the images could not
+        be retreived or classified
+    '''
+
+    from .panorama import PanoramaHeadingError
+
+    try:
+        if images is None:
+            images = retreive_pano_images(panoID, HEADINGS, PITCH, size)
+        greenPercent = green_percent_of_images(images)
+        release_pano_images(panoID, HEADINGS, size)
+
+    # if the GSV images are not download successfully or failed to run, then
+    # return a null value, the missing heading of a panorama stops the run
+    except (KeyboardInterrupt, SystemExit, PanoramaHeadingError):
+        raise
+    except BaseException:
+        print("Unexpected error:", sys.exc_info())
+        greenPercent = -1000
+
+    # calculate the green view index by averaging six percents from six images
+    return greenPercent / float(len(HEADINGS))
+
+
+def format_result_line(panoID, panoDate, lon, lat, greenView):
+    ''' Return the line of a panorama in the green view result txt files '''
+
+    return 'panoID: %s panoDate: %s longitude: %s latitude: %s, greenview: %s\n' % (
+        panoID, panoDate, lon, lat, greenView)
+
+
+def get_api_url(panoID, heading, pitch, size=FULL_SIZE):
+    params = {
+        "size": "%sx%s" % (size, size),
+        "pano": panoID,
+        "fov": 60,
+        "heading": heading,
+        "pitch": pitch,
+        "sensor": "false",
+        "key": config.gcloud_key,
+        "source": "outdoor"
+    }
+    URL = "http://maps.googleapis.com/maps/api/streetview?" + urlencode(params)
+    return URL
+
+
+def get_api_image(url, img_path, cache=None):
+    import requests
+
+    response = requests.get(url, stream=True)
+    image = Image.open(response.raw)
+
+    if cache is None:
+        save_img_to_local(image, img_path)
+    else:
+        cache.put(os.path.basename(img_path), image)
+
+    # let the code to pause by 1s, in order to not go over
+    # data limitation of Google quota
+    time.sleep(0.005)
+
+    return np.array(image)
+
+
+def save_img_to_local(image, path):
+    # Saving the images to a local path
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    image.save(path)
+
+
+def get_image_name(panoID, heading, size=FULL_SIZE):
+    if size == FULL_SIZE:
+        return str(panoID) + '_' + str(heading) + '.jpg'
+    return str(panoID) + '_' + str(heading) + '_' + str(size) + 'px.jpg'
+
+
+def get_image_cache():
+    ''' Return the cache of the image folder, or None if the size of the image
+    folder is not limited in config.IMAGE_CACHE '''
+
+    if config.IMAGE_CACHE['max_bytes'] is None:
+        return None
+
+    from .imageCache import get_cache
+    return get_cache(config.GVIfile['images'], config.IMAGE_CACHE['max_bytes'],
+                     config.IMAGE_CACHE['policy'])
+
+
+def read_local_image(img_name, cache):
+    ''' Return the image of the image folder, or None if it is not there '''
+
+    if cache is not None:
+        img_path = cache.get(img_name)
+    else:
+        img_path = config.GVIfile['images'] + img_name
+
+    if img_path is None:
+        return None
+
+    # the image can be evicted by another thread or process in between, it
+    # is then downloaded again
+    try:
+        return np.array(Image.open(img_path))
+    except (IOError, OSError):
+        return None
+
+
+def downsample_image(im, size):
+    ''' Downsample the numpy array image to size x size pixels '''
+
+    image = Image.fromarray(im).resize((size, size), Image.LANCZOS)
+    return np.array(image)
+
+
+def retreive_image(URL, panoID, heading, size=FULL_SIZE):
+    ''' A function that retreives an image it first cheks if it exists locally,
+     if it doesn't it fetches the image from the API, save it and return it.
+     The images smaller than the full size are downsampled from the full size
+     image when it is available locally'''
+
+    img_name = get_image_name(panoID, heading, size)
+    img_path = config.GVIfile['images'] + img_name
+    cache = get_image_cache()
+
+    # If the images exists locally it retreives it
+    im = read_local_image(img_name, cache)
+    if im is not None:
+        return im
+
+    if size < FULL_SIZE:
+        im = read_local_image(get_image_name(panoID, heading), cache)
+        if im is not None:
+            return downsample_image(im, size)
+
+    return get_api_image(URL, img_path, cache)
+
+
+def release_pano_images(panoID, headingArr, size=None):
+    ''' Record in the image cache that the images of the panorama have been
+    classified, they can then be evicted with the 'classified' policy '''
+
+    if size is None:
+        size = config.IMG_SIZE
+
+    cache = get_image_cache()
+    if cache is not None:
+        names = [get_image_name(panoID, heading, size) for heading in headingArr]
+        if size < FULL_SIZE:
+            names += [get_image_name(panoID, heading) for heading in headingArr]
+        cache.mark_classified(names)
+
+
+def get_pano_lists_from_file(txtfilename, greenmonth):
+    lines = open(txtfilename, "r")
+
+    # create empty lists, to store the information of panos,and remove
+    # duplicates
+    panoIDLst = []
+    panoDateLst = []
+    panoLonLst = []
+    panoLatLst = []
+
+    # loop all lines in the txt files
+    for line in lines:
+        metadata = line.split(" ")
+        panoID = metadata[1]
+        panoDate = metadata[3]
+        month = panoDate[-2:]
+        lon = metadata[5]
+        lat = metadata[7][:-1]
+
+        # in case, the longitude and latitude are invalide
+        if len(lon) < 3:
+            continue
+
+        # only use the months of green seasons
+        if month not in greenmonth:
+            continue
+        if panoID in panoIDLst:
+            continue
+        else:
+            panoIDLst.append(panoID)
+            panoDateLst.append(panoDate)
+            panoLonLst.append(lon)
+            panoLatLst.append(lat)
+
+    lines.close()
+
+    return panoIDLst, panoDateLst, panoLonLst, panoLatLst
@@ -1,4 +1,37 @@
-import Treepedia.metadataCollector 
-import Treepedia.Greenview2Shp
-import Treepedia.GreenViewCalc
-import Treepedia.createPoints
+# The Treepedia package, the stages of the workflow are the submodules
+# createPoints, metadataCollector, GreenViewCalc and Greenview2Shp. The
+# submodules are only imported when they are first used, so that a process
+# which only classifies images does not import GDAL, Fiona or pyproj.
+# Run the stages from the command line with: python -m Treepedia --help
+
+import importlib
+
+# the stages, imported by "from Treepedia import *", the other submodules are
+# only imported when they are used
+__all__ = [
+    'createPoints',
+    'metadataCollector',
+    'GreenViewCalc',
+    'Greenview2Shp',
+    ]
+
+_submodules = __all__ + [
+    'config',
+    'tiling',
+    'streaming',
+    'imageCache',
+    'calibration',
+    'temporal',
+    'planner',
+    'panorama',
+    'ordering',
+    'benchmark',
+    'batch',
+    'adaptive',
+    ]
+
+
+def __getattr__(name):
+    if name in _submodules:
+        return importlib.import_module('.' + name, __name__)
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
@@ -0,0 +1,294 @@
+# This program is used to sample the green view index coarse to fine, instead of every
+# mini_dist meters along all the streets. The sample points of every street are the
+# points of createPoints, every mini_dist meters, but only some of them are measured:
+#   - first the points every coarse_dist meters, and the last point of every street
+#   - then, round after round, the middle point of the segments between two measured
+#     points whose green view differs by more than the threshold, the segments with
+#     the largest differences first, until no segment differs by more than the
+#     threshold (or can be split) or the budget of image requests is spent
+#   - the points not measured are interpolated along the street between the measured
+#     points on both sides, and flagged as estimated, but not across a measured point
+#     without green view, the coverage may stop anywhere on each side of it
+# Every round, the coarse points first, dispatches at most the points the rest of the
+# budget can pay for, a point costing at most the images of one panorama, so a small
+# budget leaves some coarse points unmeasured rather than being overspent.
+# The sample points are projected to WGS84 in the main thread, the workers only get
+# their coordinates.
+# A measured point without panorama in a green month has no green view. A segment with
+# one such end is split, to find where the coverage stops, a segment with two is not.
+# A point whose metadata request or green view computation failed is not a point
+# without coverage, it is left out of the measured points and tried again in the next
+# rounds, up to MAX_RETRIES times, then interpolated like the points not measured.
+# The uniform streets are covered by a few measures, the image requests are spent
+# where the canopy changes.
+
+import bisect
+import sys
+import threading
+
+from . import config
+
+
+# the result of a point whose metadata request or green view computation failed
+FAILED = 'failed'
+MAX_RETRIES = 2
+
+
+def coarse_indices(numPoints, step):
+    ''' Return the positions of the points measured first along a street '''
+
+    if numPoints == 0:
+        return []
+    indices = list(range(0, numPoints, step))
+    if indices[-1] != numPoints - 1:
+        indices.append(numPoints - 1)
+    return indices
+
+
+def split_segments(streets, measured, threshold):
+    '''
+    Return the segments to split, as (difference, street, start, end), the
+    largest differences first, the difference is None when one end has no
+    green view
+    '''
+
+    segments = []
+    for s in range(len(streets)):
+        indices = sorted(measured[s])
+        for i, j in zip(indices[:-1], indices[1:]):
+            if j - i < 2:
+                continue
+            first = measured[s][i]
+            last = measured[s][j]
+            if first is None and last is None:
+                continue
+            if first is None or last is None:
+                segments.append((None, s, i, j))
+                continue
+            difference = abs(first['greenView'] - last['greenView'])
+            if difference > threshold:
+                segments.append((difference, s, i, j))
+
+    # the segments on the border of the coverage after the others
+    segments.sort(key=lambda segment: -1 if segment[0] is None else segment[0], reverse=True)
+    return segments
+
+
+def interpolate_street(offsets, measured):
+    '''
+    Return the green view of every point of the street, as (greenView,
+    estimated), the points not measured are interpolated between the nearest
+    measured points on both sides, or copied from the measured point on one
+    side at the ends of the street. The green view is None when it is not
+    known, or when the nearest measured point on one side has no green view.
+    '''
+
+    indices = sorted(measured)
+    values = []
+    for k in range(len(offsets)):
+        if k in measured:
+            result = measured[k]
+            values.append((None if result is None else result['greenView'], 0))
+            continue
+
+        pos = bisect.bisect_left(indices, k)
+        left = indices[pos - 1] if pos > 0 else None
+        right = indices[pos] if pos < len(indices) else None
+        first = None if left is None or measured[left] is None else measured[left]['greenView']
+        last = None if right is None or measured[right] is None else measured[right]['greenView']
+        if (left is not None and first is None) or (right is not None and last is None):
+            # no interpolation across a point without coverage
+            values.append((None, 1))
+        elif first is None and last is None:
+            values.append((None, 1))
+        elif first is None:
+            values.append((last, 1))
+        elif last is None:
+            values.append((first, 1))
+        else:
+            ratio = (offsets[k] - offsets[left]) / float(offsets[right] - offsets[left])
+            values.append((first + ratio * (last - first), 1))
+
+    return values
+
+
+def adaptiveGreenView(inshp, outshp, mini_dist, greenmonth, coarseDist=None,
+                      threshold=None, budget=None, workers=4):
+    '''
+    This function is used to compute the green view index along the streets
+    coarse to fine, and to write the measured and the estimated points in a
+    shapefile, with the fields greenView, estimated (1 for the interpolated
+    points), panoID and panoDate.
+
+    Required modules: Fiona, Shapely and pyproj
+
+    Parameters:
+        inshp: the input linear shapefile, must be in WGS84 projection, ESPG: 4326
+        outshp: the output point shapefile
+        mini_dist: the distance between two sample points in meters
+        greenmonth: a list of the green season, greenmonth = ['05','06','07','08','09']
+        coarseDist: the distance between the points measured first, config.ADAPTIVE by default
+        threshold: the green view difference of the segments split, config.ADAPTIVE by default
+        budget: the maximum number of image requests, None for no limit
+        workers: the number of threads requesting the metadata and the images
+
+    Return:
+        a dictionary of the number of points measured and estimated, and of the image requests
+    '''
+
+    import fiona
+    from fiona.crs import from_epsg
+    from shapely.geometry import mapping
+    from shapely.ops import transform
+    from .createPoints import iter_streets, get_projections
+    from .metadataCollector import get_pano_metadata, get_keys
+    from .GreenViewCalc import compute_pano_green_view, HEADINGS
+    from .planner import count_missing_images
+    from .streaming import threaded_map
+
+    if coarseDist is None:
+        coarseDist = config.ADAPTIVE['coarse_dist']
+    if threshold is None:
+        threshold = config.ADAPTIVE['threshold']
+    if budget is None:
+        budget = config.ADAPTIVE['budget']
+    step = max(1, int(round(coarseDist / float(mini_dist))))
+    requestsPerPano = 1 if config.ACQUISITION == 'panorama' else len(HEADINGS)
+
+    key = get_keys()
+    project2 = get_projections()[1]
+    streets = [(line2, list(range(0, int(line2.length), mini_dist)))
+               for line2 in iter_streets(inshp)]
+    measured = [dict() for street in streets]
+
+    # the green view of the panoramas already classified, the neighbouring
+    # points often share a panorama
+    panoGreenView = {}
+    lock = threading.Lock()
+
+    # the projection is not shared with the workers, the points are projected
+    # in the main thread
+    def get_point(s, i):
+        line2, offsets = streets[s]
+        return transform(project2, line2.interpolate(offsets[i]))
+
+    def measure(item):
+        s, i, lon, lat = item
+        try:
+            panoItems = get_pano_metadata(lat, lon, key, greenmonth)
+        except (KeyboardInterrupt, SystemExit):
+            raise
+        except BaseException:
+            print("Unexpected error:", sys.exc_info())
+            return s, i, FAILED, 0
+        if panoItems is None:
+            return s, i, None, 0
+
+        panoDate, panoId, panoLat, panoLon = panoItems
+        if panoDate is None or panoDate[-2:] not in greenmonth:
+            return s, i, None, 0
+
+        with lock:
+            greenView = panoGreenView.get(panoId)
+        numRequests = 0
+        if greenView is None:
+            numRequests = count_missing_images([panoId], config.IMG_SIZE)
+            greenView = compute_pano_green_view(panoId)
+            if greenView < 0:
+                return s, i, FAILED, numRequests
+
+            with lock:
+                panoGreenView[panoId] = greenView
+
+        return s, i, {'greenView': greenView, 'panoID': panoId, 'panoDate': panoDate}, numRequests
+
+    coarse = [(s, i) for s in range(len(streets))
+              for i in coarse_indices(len(streets[s][1]), step)]
+    segments = []
+    failed = []
+    retries = {}
+    givenUp = set()
+    numRequests = 0
+    numRound = 0
+    while True:
+        # the coarse points first, then the failed points, then the middle of
+        # the segments, the middle of a segment is skipped when it is a
+        # failed point
+        skipped = givenUp.union(failed)
+        middles = [(s, (i + j) // 2) for difference, s, i, j in segments]
+        todo = coarse + failed + [point for point in middles if point not in skipped]
+        if budget is not None:
+            # a point costs at most the images of one panorama, a panorama
+            # already classified costs nothing, so the budget is checked again
+            # after every round
+            todo = todo[:max(0, (budget - numRequests) // requestsPerPano)]
+        if not todo:
+            break
+        numCoarse = min(len(coarse), len(todo))
+        coarse = coarse[numCoarse:]
+        failed = failed[len(todo) - numCoarse:]
+
+        items = []
+        for s, i in todo:
+            point = get_point(s, i)
+            items.append((s, i, point.x, point.y))
+        for s, i, result, requests in threaded_map(measure, items, workers, workers * 4):
+            numRequests = numRequests + requests
+            if result is not FAILED:
+                measured[s][i] = result
+                continue
+
+            retries[(s, i)] = retries.get((s, i), 0) + 1
+            if retries[(s, i)] > MAX_RETRIES:
+                givenUp.add((s, i))
+            else:
+                failed.append((s, i))
+        print('Round %s: %s points measured, %s image requests' % (
+            numRound, len(todo), numRequests))
+        numRound = numRound + 1
+
+        segments = split_segments(streets, measured, threshold)
+
+    if coarse:
+        print('The budget of %s image requests is spent, %s coarse points not measured' % (
+            budget, len(coarse)))
+    numFailed = len(givenUp) + len(failed)
+    if numFailed > 0:
+        print('%s points failed and are interpolated' % numFailed)
+
+    schema = {
+        'geometry': 'Point',
+        'properties': {'greenView': 'float', 'estimated': 'int',
+                       'panoID': 'str', 'panoDate': 'str'},
+    }
+
+    numMeasured = 0
+    numEstimated = 0
+    numPoints = 0
+    with fiona.open(outshp, 'w', crs=from_epsg(4326), driver='ESRI Shapefile', schema=schema) as output:
+        for s in range(len(streets)):
+            offsets = streets[s][1]
+            numPoints = numPoints + len(offsets)
+            for k, (greenView, estimated) in enumerate(interpolate_street(offsets, measured[s])):
+                if greenView is None:
+                    continue
+
+                result = measured[s].get(k) or {}
+                output.write({'geometry': mapping(get_point(s, k)),
+                              'properties': {'greenView': greenView,
+                                             'estimated': estimated,
+                                             'panoID': result.get('panoID', ''),
+                                             'panoDate': result.get('panoDate', '')}})
+                if estimated:
+                    numEstimated = numEstimated + 1
+                else:
+                    numMeasured = numMeasured + 1
+
+    summary = {'points': numPoints, 'measured': numMeasured, 'estimated': numEstimated,
+               'failed': numFailed, 'image_requests': numRequests, 'rounds': numRound}
+    print('Sample points:    %s' % numPoints)
+    print('Points measured:  %s' % numMeasured)
+    print('Points estimated: %s' % numEstimated)
+    print('Image requests:   %s' % numRequests)
+
+    return summary
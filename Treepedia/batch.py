@@ -0,0 +1,374 @@
+# This program is used to run Treepedia on many areas at once, described in a json
+# manifest, instead of editing config.py and running the steps for every area:
+#
+# {
+#     "root": "batch",
+#     "areas": [
+#         {"name": "Knightswood", "input": "Knightswood_lines.shp", "dist": 50},
+#         {"name": "Partick", "input": "Partick_lines.shp"}
+#     ],
+#     "quota": {"requests": 25000, "per_minute": 500},
+#     "workers": 4
+# }
+#
+# The areas are processed concurrently, the scheduler takes one sample point of every
+# area in turn, so all the areas progress at the same pace. The areas share:
+#   - the image folder of config.GVIfile['images'], and its cache (imageCache.py)
+#   - a pano registry, the metadata of every sample location and the green view of every
+#     panorama already computed, a panorama on the border of two areas is computed once
+#   - the API quota budget, the total number of requests and the requests per minute
+# Every area is written in its own folder of the root folder, the sample points already
+# processed are skipped when the run is restarted. A summary of the throughput of every
+# area is printed and saved in summary.json in the root folder.
+
+import json
+import os
+import os.path
+import sqlite3
+import sys
+import threading
+import time
+
+from . import config
+
+
+REGISTRY_FILE = 'panoRegistry.sqlite'
+
+
+class QuotaExhausted(Exception):
+    pass
+
+
+class QuotaBudget(object):
+    '''
+    The API quota shared by the areas, the total number of requests of the
+    run and the number of requests per minute, None for no limit
+    '''
+
+    def __init__(self, maxRequests=None, perMinute=None):
+        self.maxRequests = maxRequests
+        self.perMinute = perMinute
+        self.used = 0
+        self.nextTime = time.time()
+        self.lock = threading.Lock()
+
+    def acquire(self, numRequests=1):
+        ''' Wait until numRequests requests can be sent under the quota '''
+
+        if numRequests == 0:
+            return
+
+        with self.lock:
+            if self.maxRequests is not None and self.used + numRequests > self.maxRequests:
+                raise QuotaExhausted('The quota of %s requests is used' % self.maxRequests)
+            self.used = self.used + numRequests
+
+            wait = 0.0
+            if self.perMinute:
+                now = time.time()
+                wait = max(0.0, self.nextTime - now)
+                self.nextTime = max(now, self.nextTime) + numRequests * 60.0 / self.perMinute
+
+        if wait > 0:
+            time.sleep(wait)
+
+
+class PanoRegistry(object):
+    '''
+    The metadata of the sample locations and the green view of the panoramas
+    computed by all the areas, saved in a sqlite file. A panorama is computed
+    by one thread at a time, the other threads wait for its green view.
+    '''
+
+    def __init__(self, registryFile):
+        self.lock = threading.Lock()
+        self.pending = {}
+        self.db = sqlite3.connect(registryFile, timeout=60, check_same_thread=False)
+        with self.lock, self.db:
+            self.db.execute(
+                'CREATE TABLE IF NOT EXISTS metadata ('
+                'location TEXT PRIMARY KEY, panoID TEXT, panoDate TEXT, lat TEXT, lon TEXT)')
+            self.db.execute(
+                'CREATE TABLE IF NOT EXISTS greenview (panoID TEXT PRIMARY KEY, greenView REAL)')
+
+    def get_metadata(self, location):
+        ''' Return the metadata row of the location, None if never requested '''
+
+        with self.lock:
+            return self.db.execute(
+                'SELECT panoID, panoDate, lat, lon FROM metadata WHERE location = ?',
+                (location,)).fetchone()
+
+    def put_metadata(self, location, panoItems):
+        # the locations without panorama are saved too, with a NULL panoID
+        if panoItems is None:
+            row = (location, None, None, None, None)
+        else:
+            panoDate, panoId, panoLat, panoLon = panoItems
+            row = (location, panoId, panoDate, str(panoLat), str(panoLon))
+
+        with self.lock, self.db:
+            self.db.execute('INSERT OR REPLACE INTO metadata VALUES (?, ?, ?, ?, ?)', row)
+
+    def get_green_view(self, panoID):
+        with self.lock:
+            row = self.db.execute(
+                'SELECT greenView FROM greenview WHERE panoID = ?', (panoID,)).fetchone()
+        return None if row is None else row[0]
+
+    def claim(self, panoID):
+        '''
+        Return True if the calling thread has to compute the green view of
+        the panorama, or wait for the thread computing it and return False
+        '''
+
+        with self.lock:
+            event = self.pending.get(panoID)
+            if event is None:
+                self.pending[panoID] = threading.Event()
+                return True
+
+        event.wait()
+        return False
+
+    def put_green_view(self, panoID, greenView):
+        with self.lock, self.db:
+            # the failed panoramas are not saved, they are tried again
+            if greenView >= 0:
+                self.db.execute('INSERT OR REPLACE INTO greenview VALUES (?, ?)',
+                                (panoID, greenView))
+            event = self.pending.pop(panoID, None)
+
+        if event is not None:
+            event.set()
+
+
+def read_manifest(manifestJson):
+    with open(manifestJson, 'r') as jsonFile:
+        manifest = json.load(jsonFile)
+
+    names = [area['name'] for area in manifest['areas']]
+    if len(set(names)) != len(names):
+        raise ValueError('The names of the areas of the manifest should be unique')
+
+    return manifest
+
+
+def prepare_area(area, root):
+    '''
+    Create the folder and the sample points of the area, ordered along the
+    Hilbert curve, return the list of the points not processed yet
+    '''
+
+    import fiona
+    from .createPoints import createPoints
+    from .ordering import orderPoints
+
+    areaDir = os.path.join(root, area['name'])
+    os.makedirs(areaDir, exist_ok=True)
+    allPoints = os.path.join(areaDir, 'points_all.shp')
+    points = os.path.join(areaDir, 'points.shp')
+    area['dir'] = areaDir
+    area['output'] = os.path.join(areaDir, 'GV_batch.txt')
+    area['log'] = os.path.join(areaDir, 'points_done.txt')
+
+    if not os.path.exists(points):
+        createPoints(area['input'], allPoints, area.get('dist', config.POINT_DIST))
+        orderPoints(allPoints, points)
+
+    donePnts = set()
+    if os.path.exists(area['log']):
+        with open(area['log'], 'r') as logText:
+            donePnts = set(int(line) for line in logText if line.strip())
+
+    todo = []
+    with fiona.open(points) as source:
+        for pntID, feat in enumerate(source):
+            if pntID not in donePnts:
+                lon, lat = feat['geometry']['coordinates'][:2]
+                todo.append((pntID, lat, lon))
+
+    print('Area %s: %s points to process, %s already done' % (
+        area['name'], len(todo), len(donePnts)))
+    return todo
+
+
+def round_robin(areas, todos):
+    ''' Yield one point of every area in turn, as (area index, point) '''
+
+    positions = [0] * len(areas)
+    active = [i for i in range(len(areas)) if todos[i]]
+    while active:
+        for i in list(active):
+            yield i, todos[i][positions[i]]
+            positions[i] = positions[i] + 1
+            if positions[i] >= len(todos[i]):
+                active.remove(i)
+
+
+def process_point(pntID, lat, lon, greenmonth, registry, quota, counts):
+    '''
+    Return the green view result of the sample point, or None if it has no
+    panorama in a green month, the metadata and the green view are taken from
+    the registry when possible. The green view of the result is negative when
+    the metadata request or the green view computation failed, the point is
+    then processed again by the next run. The requests sent and the panoramas
+    computed are added to counts.
+    '''
+
+    from .metadataCollector import get_pano_metadata, get_keys
+    from .GreenViewCalc import compute_pano_green_view, FAILED_GREEN_VIEW
+    from .planner import count_missing_images
+
+    failed = {'pntID': pntID, 'panoID': None, 'greenView': FAILED_GREEN_VIEW}
+
+    # the metadata request, and the history request of the panoramas not in
+    # a green month, are counted against the quota
+    def on_request():
+        quota.acquire(1)
+        counts['requests'] = counts['requests'] + 1
+
+    location = '%.6f,%.6f' % (lat, lon)
+    row = registry.get_metadata(location)
+    if row is None:
+        try:
+            panoItems = get_pano_metadata(lat, lon, get_keys(), greenmonth, on_request)
+        except (QuotaExhausted, KeyboardInterrupt, SystemExit):
+            raise
+        except BaseException:
+            print("Unexpected error:", sys.exc_info())
+            return failed
+        registry.put_metadata(location, panoItems)
+        row = registry.get_metadata(location)
+
+    panoID, panoDate, panoLat, panoLon = row
+    if panoID is None or panoDate is None or panoDate[-2:] not in greenmonth:
+        return None
+
+    greenView = registry.get_green_view(panoID)
+    while greenView is None:
+        if not registry.claim(panoID):
+            # the other thread is done, if it failed the panorama is claimed
+            # again by this thread
+            greenView = registry.get_green_view(panoID)
+            continue
+
+        numRequests = count_missing_images([panoID], config.IMG_SIZE)
+        try:
+            quota.acquire(numRequests)
+        except QuotaExhausted:
+            registry.put_green_view(panoID, -1)
+            raise
+        counts['requests'] = counts['requests'] + numRequests
+
+        try:
+            greenView = compute_pano_green_view(panoID)
+        except BaseException:
+            # a missing panorama heading stops the run, the waiting threads
+            # are released first
+            registry.put_green_view(panoID, -1)
+            raise
+        if greenView >= 0:
+            counts['panos_computed'] = counts['panos_computed'] + 1
+        registry.put_green_view(panoID, greenView)
+
+    return {'pntID': pntID, 'panoID': panoID, 'panoDate': panoDate,
+            'lon': panoLon, 'lat': panoLat, 'greenView': greenView}
+
+
+def runBatch(manifest, greenmonth, workers=None):
+    '''
+    This function is used to process all the areas of the manifest, with
+    shared caches and quota.
+
+    Parameters:
+        manifest: the manifest dictionary, see read_manifest
+        greenmonth: a list of the green season, greenmonth = ['05','06','07','08','09']
+        workers: the number of threads, the manifest value by default
+
+    Return:
+        the summary dictionary, per area
+    '''
+
+    from .streaming import threaded_map
+    from .GreenViewCalc import format_result_line
+
+    root = manifest.get('root', 'batch')
+    os.makedirs(root, exist_ok=True)
+    if workers is None:
+        workers = manifest.get('workers', 4)
+    quotaItems = manifest.get('quota', {})
+    quota = QuotaBudget(quotaItems.get('requests'), quotaItems.get('per_minute'))
+    registry = PanoRegistry(os.path.join(root, REGISTRY_FILE))
+
+    areas = manifest['areas']
+    todos = [prepare_area(area, root) for area in areas]
+    stats = [{'points': 0, 'panos': 0, 'requests': 0, 'panos_computed': 0, 'failed': 0,
+              'points_todo': len(todos[i])} for i in range(len(areas))]
+    outputs = [open(area['output'], 'a') for area in areas]
+    logs = [open(area['log'], 'a') for area in areas]
+
+    # the counters of the workers are merged by the main thread
+    def work(item):
+        i, (pntID, lat, lon) = item
+        counts = {'requests': 0, 'panos_computed': 0}
+        try:
+            result = process_point(pntID, lat, lon, greenmonth, registry, quota, counts)
+        except QuotaExhausted as error:
+            # raised by the main thread, after counting the requests sent
+            result = error
+        return i, pntID, result, counts
+
+    start = time.time()
+    try:
+        for i, pntID, result, counts in threaded_map(work, round_robin(areas, todos), workers, workers * 4):
+            for key in counts:
+                stats[i][key] = stats[i][key] + counts[key]
+            if isinstance(result, QuotaExhausted):
+                raise result
+
+            # the failed points are not logged, the next run tries them again
+            if result is not None and result['greenView'] < 0:
+                stats[i]['failed'] = stats[i]['failed'] + 1
+                continue
+
+            if result is not None:
+                outputs[i].write('pntID: %s ' % pntID + format_result_line(
+                    result['panoID'], result['panoDate'], result['lon'], result['lat'],
+                    result['greenView']))
+                outputs[i].flush()
+                stats[i]['panos'] = stats[i]['panos'] + 1
+            logs[i].write('%s\n' % pntID)
+            logs[i].flush()
+            stats[i]['points'] = stats[i]['points'] + 1
+    except QuotaExhausted as error:
+        print('%s, run the batch again to resume' % error)
+    finally:
+        for txtfile in outputs + logs:
+            txtfile.close()
+
+        # the summary is also written when the run is interrupted
+        elapsed = time.time() - start
+        summary = {}
+        for i, area in enumerate(areas):
+            item = dict(stats[i])
+            item['seconds'] = elapsed
+            item['points_per_second'] = item['points'] / elapsed if elapsed > 0 else 0.0
+            item['complete'] = item['points'] == item['points_todo']
+            summary[area['name']] = item
+
+        print_summary(summary)
+        with open(os.path.join(root, 'summary.json'), 'w') as jsonFile:
+            json.dump(summary, jsonFile, indent=1)
+
+    return summary
+
+
+def print_summary(summary):
+    print('%-20s %8s %8s %8s %8s %9s %10s %8s' % (
+        'area', 'points', 'panos', 'computed', 'failed', 'requests', 'points/s', 'complete'))
+    for name in sorted(summary):
+        item = summary[name]
+        print('%-20s %8s %8s %8s %8s %9s %10.2f %8s' % (
+            name, item['points'], item['panos'], item['panos_computed'], item['failed'],
+            item['requests'], item['points_per_second'], item['complete']))
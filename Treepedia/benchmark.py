@@ -0,0 +1,608 @@
+# This program is used to benchmark the hot path of the green view computation, and to
+# check that an optimization does not change the results. Every case runs a function on
+# a fixed input, and records the time per call, the peak memory allocated by Python and
+# numpy (tracemalloc, the memory allocated inside pymeanshift is not seen) and the result,
+# the golden value. The inputs are the images of the repository (img.jpg and images/)
+# and synthetic street scenes, and synthetic metadata and result txt files for the
+# text parsers. The rendering of the views is checked on synthetic panoramas encoding
+# the direction of every pixel, in memory and read from the disk with their panoID.json
+# heading file, and the parser of the photometa answers on benchmark_photometa.txt,
+# which reproduces the structure of an answer along the path of the heading.
+
+# Record the benchmark:  python -m Treepedia bench --record bench.json
+# Compare with it:       python -m Treepedia bench --compare bench.json
+# The comparison flags the cases slower than the recorded time by more than the time
+# tolerance, and the cases whose result drifts by more than the value tolerance.
+
+# The golden file of the repository, benchmark_golden.json, is compared by default with
+# "python -m Treepedia bench --compare". Its values come from the images of the
+# repository and the seeded scenes, the reference cases (graythresh_histogram and
+# green_percent_float) run the original np.histogram implementation, and the *_vs_*
+# cases hold the difference between the current kernels and the original ones. Its
+# times were measured on the machine described in its "machine" item and are not
+# compared, compare the times against a file recorded on the same machine, where the
+# slowdowns under MIN_TIME_DIFFERENCE seconds, the timer noise, are not flagged either.
+# It was recorded without pymeanshift, so it has no VegetationClassification value, the
+# classification hot path: record a file on a machine with pymeanshift to check it.
+
+import datetime
+import glob
+import hashlib
+import json
+import os
+import os.path
+import platform
+import shutil
+import tempfile
+import time
+import tracemalloc
+import warnings
+
+import numpy as np
+from PIL import Image
+
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MIN_SECONDS = 0.5
+MIN_TIME_DIFFERENCE = 0.002
+GOLDEN_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_golden.json')
+PHOTOMETA_FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_photometa.txt')
+
+
+def repository_images(size=400):
+    ''' Return the images of the repository as (name, RGB array) pairs '''
+
+    paths = [os.path.join(REPO_DIR, 'img.jpg')]
+    paths += sorted(glob.glob(os.path.join(REPO_DIR, 'images', '*')))
+
+    images = []
+    for path in paths:
+        if not os.path.isfile(path):
+            continue
+        image = Image.open(path).convert('RGB').resize((size, size), Image.BILINEAR)
+        images.append((os.path.basename(path), np.array(image)))
+
+    return images
+
+
+def synthetic_scene(seed, size=400):
+    '''
+    Return a synthetic street scene, sky on the top, a road on the bottom,
+    buildings on the sides and tree crowns of random green tones, some of
+    them in shadow. The scene only depends on the seed.
+    '''
+
+    rng = np.random.RandomState(seed)
+    rows, cols = np.mgrid[0:size, 0:size]
+    scene = np.zeros((size, size, 3), dtype=np.float64)
+
+    horizon = int(size * rng.uniform(0.4, 0.6))
+    scene[:horizon] = [rng.uniform(120, 200), rng.uniform(160, 220), 240]
+    scene[horizon:] = [110, 110, 115]
+
+    for side in (0, 1):
+        width = int(size * rng.uniform(0.1, 0.3))
+        top = int(horizon * rng.uniform(0.1, 0.6))
+        columns = slice(0, width) if side == 0 else slice(size - width, size)
+        scene[top:horizon, columns] = [rng.uniform(120, 180), rng.uniform(90, 130), rng.uniform(70, 110)]
+
+    for crown in range(rng.randint(3, 12)):
+        cy = rng.uniform(0.1, 0.7) * size
+        cx = rng.uniform(0, 1) * size
+        radius = rng.uniform(0.05, 0.2) * size
+        inside = (rows - cy) ** 2 + (cols - cx) ** 2 < radius ** 2
+        shade = rng.uniform(0.2, 1.0)
+        scene[inside] = np.array([rng.uniform(40, 110), rng.uniform(90, 170), rng.uniform(30, 90)]) * shade
+
+    scene = scene + rng.normal(0, 6, scene.shape)
+    return np.clip(scene, 0, 255).astype(np.uint8)
+
+
+def posterize(image, step=32):
+    ''' A deterministic stand-in of the segmentation, few distinct colours '''
+
+    return (image // step * step + step // 2).astype(np.uint8)
+
+
+def excess_green(image):
+    I = image / 255.0
+    return (I[:, :, 1] - I[:, :, 0]) + (I[:, :, 1] - I[:, :, 2])
+
+
+def graythresh_histogram(array, level):
+    '''
+    The original Otsu threshold of graythresh, with the histogram of all the
+    pixels computed by np.histogram, kept as the reference of the bincount
+    histogram of graythresh
+    '''
+
+    np.seterr(divide='ignore', invalid='ignore')
+
+    maxVal = np.max(array)
+    minVal = np.min(array)
+
+    # if the inputImage is a float of double dataset then we transform the data
+    # in to byte and range from [0 255]
+    if maxVal <= 1:
+        array = array * 255
+    elif maxVal >= 256:
+        array = (array - minVal) * 255.0 / (maxVal - minVal)
+
+    # turn the negative to natural number
+    negIdx = np.where(array < 0)
+    array[negIdx] = 0
+
+    # calculate the hist of 'array'
+    hist = np.histogram(array, range(257))
+    P_hist = hist[0] * 1.0 / np.sum(hist[0])
+
+    omega = P_hist.cumsum()
+
+    temp = np.arange(256)
+    mu = P_hist * (temp + 1)
+    mu = mu.cumsum()
+
+    n = len(mu)
+    mu_t = mu[n - 1]
+
+    sigma_b_squared = (mu_t * omega - mu)**2 / (omega * (1 - omega))
+
+    # try to found if all sigma_b squrered are NaN or Infinity
+    indInf = np.where(sigma_b_squared == np.inf)
+
+    CIN = 0
+    if len(indInf[0]) > 0:
+        CIN = len(indInf[0])
+
+    maxval = np.max(sigma_b_squared)
+
+    IsAllInf = CIN == 256
+    if IsAllInf != 1:
+        index = np.where(sigma_b_squared == maxval)
+        idx = np.mean(index)
+        threshold = (idx - 1) / 255.0
+    else:
+        threshold = level
+
+    if np.isnan(threshold):
+        threshold = level
+
+    return threshold
+
+
+def green_percent_of_segmented_float(segmented_image):
+    '''
+    The original per pixel computation of the percentage of the green
+    vegetation pixels of the segmented GSV image, with the original histogram
+    Otsu threshold, kept as the reference of green_percent_of_segmented
+    '''
+
+    I = segmented_image / 255.0
+
+    red = I[:, :, 0]
+    green = I[:, :, 1]
+    blue = I[:, :, 2]
+
+    # calculate the difference between green band with other two bands
+    green_red_Diff = green - red
+    green_blue_Diff = green - blue
+
+    ExG = green_red_Diff + green_blue_Diff
+
+    redThreImgU = red < 0.6
+    greenThreImgU = green < 0.9
+    blueThreImgU = blue < 0.6
+
+    shadowRedU = red < 0.3
+    shadowGreenU = green < 0.3
+    shadowBlueU = blue < 0.3
+    del red, blue, green, I
+
+    greenImg1 = redThreImgU * blueThreImgU * greenThreImgU
+    greenImgShadow1 = shadowRedU * shadowGreenU * shadowBlueU
+    del redThreImgU, greenThreImgU, blueThreImgU
+    del shadowRedU, shadowGreenU, shadowBlueU
+
+    threshold = graythresh_histogram(ExG, 0.1)
+
+    if threshold > 0.1:
+        threshold = 0.1
+    elif threshold < 0.05:
+        threshold = 0.05
+
+    greenImg2 = ExG > threshold
+    greenImgShadow2 = ExG > 0.05
+    greenImg = greenImg1 * greenImg2 + greenImgShadow2 * greenImgShadow1
+    del ExG, green_blue_Diff, green_red_Diff
+    del greenImgShadow1, greenImgShadow2
+
+    # calculate the percentage of the green vegetation
+    greenPxlNum = len(np.where(greenImg != 0)[0])
+    greenPercent = greenPxlNum / (greenImg.shape[0] * greenImg.shape[1]) * 100
+    del greenImg1, greenImg2
+
+    return greenPercent
+
+
+def synthetic_panorama(width, centerHeading):
+    '''
+    Return a synthetic equirectangular panorama encoding the compass heading
+    and the pitch of every pixel, the cosine and the sine of the heading in
+    the red and green bands, the pitch in the blue band, so that the heading
+    has no seam
+    '''
+
+    height = width // 2
+    heading = np.radians(centerHeading - 180.0 + (np.arange(width) + 0.5) / width * 360.0)
+    pitch = 90.0 - (np.arange(height) + 0.5) / height * 180.0
+
+    panorama = np.zeros((height, width, 3), dtype=np.float64)
+    panorama[:, :, 0] = 127.5 + 127.5 * np.cos(heading)
+    panorama[:, :, 1] = 127.5 + 127.5 * np.sin(heading)
+    panorama[:, :, 2] = ((pitch + 90.0) / 180.0 * 255.0)[:, np.newaxis]
+    return np.rint(panorama).astype(np.uint8)
+
+
+def decode_direction(pixels):
+    ''' Return the compass heading and the pitch encoded in the pixels '''
+
+    pixels = np.asarray(pixels, dtype=np.float64).reshape(-1, 3).mean(axis=0)
+    heading = np.degrees(np.arctan2(pixels[1] - 127.5, pixels[0] - 127.5)) % 360.0
+    pitch = pixels[2] / 255.0 * 180.0 - 90.0
+    return heading, pitch
+
+
+def view_direction_errors(view, heading, pitch, fov=60, size=400):
+    '''
+    Return the errors in degrees of the directions of a view rendered from a
+    synthetic panorama, at the center of the view, at the middle of its top
+    and bottom edges, and of its left and right edges for a level view,
+    against the directions of the camera rays
+    '''
+
+    half = (size - 1) / 2.0
+    edgeAngle = np.degrees(np.arctan(half / (0.5 * size / np.tan(np.radians(fov) / 2))))
+    mid = [size // 2 - 1, size // 2]
+
+    def heading_error(a, b):
+        return abs((a - b + 180.0) % 360.0 - 180.0)
+
+    h, p = decode_direction(view[np.ix_(mid, mid)])
+    errors = [heading_error(h, heading), abs(p - pitch)]
+
+    # the middle of the top and bottom edges, on the central column
+    h, p = decode_direction(view[0, mid])
+    errors.append(abs(p - (pitch + edgeAngle)))
+    h, p = decode_direction(view[size - 1, mid])
+    errors.append(abs(p - (pitch - edgeAngle)))
+
+    # the middle of the left and right edges, exact for a level view
+    if pitch == 0:
+        h, p = decode_direction(view[mid, 0])
+        errors.append(heading_error(h, heading - edgeAngle))
+        h, p = decode_direction(view[mid, size - 1])
+        errors.append(heading_error(h, heading + edgeAngle))
+
+    return errors
+
+
+def render_view_error(panorama, centerHeading, views, fov=60, size=400):
+    '''
+    Return the largest error in degrees of the directions of the views
+    rendered from a synthetic panorama in memory
+    '''
+
+    from .panorama import render_view
+
+    errors = []
+    for heading, pitch in views:
+        view = render_view(panorama, heading, pitch, fov, size, centerHeading)
+        errors += view_direction_errors(view, heading, pitch, fov, size)
+
+    return round(float(max(errors)), 2)
+
+
+def write_synthetic_panorama(panoramaFolder, panoID, centerHeading, width=2400):
+    '''
+    Write a synthetic panorama and its panoID.json heading file in the
+    panorama folder, like a panorama prepared for config.ACQUISITION =
+    'panorama'
+    '''
+
+    os.makedirs(panoramaFolder, exist_ok=True)
+    image = Image.fromarray(synthetic_panorama(width, centerHeading))
+    image.save(os.path.join(panoramaFolder, panoID + '.jpg'), quality=100)
+    with open(os.path.join(panoramaFolder, panoID + '.json'), 'w') as jsonFile:
+        json.dump({'heading': centerHeading}, jsonFile)
+
+
+def render_pano_views_error(panoramaFolder, panoID, fov=60, size=400):
+    '''
+    Return the largest error in degrees of the directions of the views
+    rendered by render_pano_views at the compass headings of the Static API,
+    from a panorama and its heading file read from the panorama folder
+    '''
+
+    from . import config
+    from .panorama import render_pano_views
+    from .GreenViewCalc import HEADINGS, PITCH
+
+    saved = config.GVIfile['panoramas'], config.PANORAMA_CENTER_HEADING
+    config.GVIfile['panoramas'] = os.path.join(panoramaFolder, '')
+    config.PANORAMA_CENTER_HEADING = None
+    try:
+        views = render_pano_views(panoID, HEADINGS, PITCH, size)
+    finally:
+        config.GVIfile['panoramas'], config.PANORAMA_CENTER_HEADING = saved
+
+    errors = []
+    for heading, view in zip(HEADINGS, views):
+        errors += view_direction_errors(view, heading, PITCH, fov, size)
+
+    return round(float(max(errors)), 2)
+
+
+def parse_heading(text):
+    '''
+    Return the heading parsed from a photometa answer, or the name of the
+    error raised when the answer has no heading
+    '''
+
+    from .panorama import parse_panorama_heading, PanoramaHeadingError
+
+    try:
+        return parse_panorama_heading(text, 'fixture')
+    except PanoramaHeadingError:
+        return 'PanoramaHeadingError'
+
+
+def write_metadata_txt(txtfilename, numPano, seed, greenView=False):
+    ''' Write a synthetic metadata (or green view result) txt file '''
+
+    from .GreenViewCalc import format_result_line
+
+    rng = np.random.RandomState(seed)
+    with open(txtfilename, 'w') as txtfile:
+        for i in range(numPano):
+            # some duplicated panoramas, like neighbouring points
+            panoID = 'P%021d' % rng.randint(0, numPano * 0.8)
+            panoDate = '%d-%02d' % (rng.randint(2008, 2022), rng.randint(1, 13))
+            lon = -4.3 + rng.uniform(-0.05, 0.05)
+            lat = 55.87 + rng.uniform(-0.05, 0.05)
+            if greenView:
+                txtfile.write(format_result_line(panoID, panoDate, lon, lat, rng.uniform(-10, 60)))
+            else:
+                txtfile.write('panoID: %s panoDate: %s longitude: %s latitude: %s\n' % (
+                    panoID, panoDate, lon, lat))
+
+
+def digest(lists):
+    ''' A golden value for the lists returned by the parsers '''
+
+    text = '\n'.join(' '.join(str(item) for item in lst) for lst in lists)
+    return '%s:%s' % (len(lists[0]), hashlib.sha1(text.encode('utf-8')).hexdigest())
+
+
+def build_cases(txtFolder, numScenes=4):
+    '''
+    Return the benchmark cases, as (name, function, args) tuples, the txt
+    files of the parsers are written in txtFolder
+    '''
+
+    from .GreenViewCalc import graythresh, VegetationClassification
+    from .GreenViewCalc import green_percent_of_segmented
+    from .GreenViewCalc import get_pano_lists_from_file
+    from .Greenview2Shp import Read_GSVinfo_Text
+
+    images = repository_images()
+    images += [('synthetic%d' % seed, synthetic_scene(seed)) for seed in range(numScenes)]
+
+    cases = []
+    for name, image in images:
+        cases.append(('graythresh/%s' % name, graythresh, (excess_green(image), 0.1)))
+        segmented = posterize(image)
+        cases.append(('green_percent/%s' % name, green_percent_of_segmented, (segmented,)))
+        cases.append(('green_percent_float/%s' % name, green_percent_of_segmented_float, (segmented,)))
+
+        # the difference with the original histogram Otsu implementation,
+        # which should stay 0
+        cases.append(('graythresh_histogram/%s' % name, graythresh_histogram, (excess_green(image), 0.1)))
+        cases.append(('graythresh_vs_histogram/%s' % name,
+                      lambda array: float(graythresh(array, 0.1) - graythresh_histogram(array.copy(), 0.1)),
+                      (excess_green(image),)))
+        cases.append(('green_percent_vs_float/%s' % name,
+                      lambda image: float(green_percent_of_segmented(image) - green_percent_of_segmented_float(image)),
+                      (segmented,)))
+
+    # the meanshift segmentation needs pymeanshift
+    try:
+        import pymeanshift
+        for name, image in images:
+            cases.append(('VegetationClassification/%s' % name, VegetationClassification, (image,)))
+    except ImportError:
+        print('pymeanshift is not installed, VegetationClassification is not benchmarked')
+
+    # the rendering of the views from panoramas captured at several vehicle
+    # headings, the views are at compass headings
+    views = [(0, 0), (60, 0), (200, 0), (330, 0), (90, 20), (270, -15)]
+    for centerHeading in (0.0, 137.5, 291.0):
+        panorama = synthetic_panorama(2400, centerHeading)
+        cases.append(('render_view/center%s' % centerHeading, render_view_error,
+                      (panorama, centerHeading, views)))
+
+    # the panoramas read from the disk with their heading file
+    panoramaFolder = os.path.join(txtFolder, 'panoramas')
+    for centerHeading in (0.0, 137.5):
+        panoID = 'SYNTHETIC_PANO_%s' % centerHeading
+        write_synthetic_panorama(panoramaFolder, panoID, centerHeading)
+        cases.append(('render_pano_views/disk%s' % centerHeading, render_pano_views_error,
+                      (panoramaFolder, panoID)))
+
+    # the parser of the photometa answers, on the fixture of the repository
+    # and on answers without heading
+    with open(PHOTOMETA_FIXTURE, 'r') as fixture:
+        photometa = fixture.read()
+    prefix, data = photometa.split('\n', 1)
+    changed = json.loads(data)
+    changed[1][0][5] = []
+    cases.append(('parse_panorama_heading/fixture', parse_heading, (photometa,)))
+    cases.append(('parse_panorama_heading/changed_format', parse_heading,
+                  (prefix + '\n' + json.dumps(changed),)))
+    cases.append(('parse_panorama_heading/not_json', parse_heading,
+                  ('<html><body>Error 404</body></html>',)))
+
+    greenmonth = ['04', '05', '06', '07', '08', '09']
+    metadataTxt = os.path.join(txtFolder, 'Pnt_start0_end10000.txt')
+    write_metadata_txt(metadataTxt, 10000, 0)
+    cases.append(('get_pano_lists_from_file', lambda *args: digest(get_pano_lists_from_file(*args)),
+                  (metadataTxt, greenmonth)))
+
+    resultTxt = os.path.join(txtFolder, 'GV_Pnt_start0_end10000.txt')
+    write_metadata_txt(resultTxt, 10000, 1, greenView=True)
+    cases.append(('Read_GSVinfo_Text', lambda *args: digest(Read_GSVinfo_Text(*args)),
+                  (resultTxt,)))
+
+    return cases
+
+
+def run_case(func, args, repeat):
+    '''
+    Return the golden value, the best time per call in seconds over repeat
+    calls, and the peak memory in bytes of one call
+    '''
+
+    tracemalloc.start()
+    value = func(*args)
+    peakBytes = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    # the fast cases are repeated for at least MIN_SECONDS, to keep the
+    # noise of the timer low
+    seconds = []
+    while len(seconds) < repeat or (sum(seconds) < MIN_SECONDS and len(seconds) < 1000):
+        start = time.perf_counter()
+        func(*args)
+        seconds.append(time.perf_counter() - start)
+
+    if isinstance(value, (np.floating, np.integer)):
+        value = value.item()
+
+    return value, min(seconds), peakBytes
+
+
+def runBenchmark(repeat=5):
+    '''
+    This function is used to run all the benchmark cases
+
+    Return:
+        a dictionary name: {'value', 'seconds', 'peak_bytes'}
+    '''
+
+    np.seterr(divide='ignore', invalid='ignore')
+    txtFolder = tempfile.mkdtemp()
+    try:
+        # graythresh takes the mean of an empty selection when the Otsu
+        # variances are NaN, and then falls back to the level
+        warnings.simplefilter('ignore', RuntimeWarning)
+        results = {}
+        for name, func, args in build_cases(txtFolder):
+            value, seconds, peakBytes = run_case(func, args, repeat)
+            results[name] = {'value': value, 'seconds': seconds, 'peak_bytes': peakBytes}
+            print('%-45s %10.6fs %8.2fMB  %s' % (name, seconds, peakBytes / 1e6, value))
+    finally:
+        shutil.rmtree(txtFolder, ignore_errors=True)
+
+    return results
+
+
+def compareBenchmark(results, golden, timeTolerance=0.2, valueTolerance=1e-9,
+                     minTimeDifference=MIN_TIME_DIFFERENCE, checkTimes=True):
+    '''
+    This function is used to compare the benchmark results with the recorded
+    ones, a case is flagged when it is slower by more than timeTolerance (a
+    fraction of the recorded time) and by more than minTimeDifference seconds,
+    or when its value differs by more than valueTolerance. The times are
+    only compared with checkTimes, when the recorded times were measured on
+    the same machine.
+
+    Return:
+        the list of the flagged cases, as (name, reason)
+    '''
+
+    flagged = []
+    for name in sorted(results):
+        if name not in golden:
+            print('%-45s no recorded value' % name)
+            continue
+
+        result = results[name]
+        recorded = golden[name]
+
+        # the timer noise of the fast cases is not a slowdown
+        slowdown = result['seconds'] - recorded['seconds']
+        if checkTimes and slowdown > recorded['seconds'] * timeTolerance and slowdown > minTimeDifference:
+            flagged.append((name, 'slower: %.6fs, recorded %.6fs' % (
+                result['seconds'], recorded['seconds'])))
+
+        value = result['value']
+        goldenValue = recorded['value']
+        if isinstance(value, float) and isinstance(goldenValue, (int, float)):
+            drift = abs(value - goldenValue) > valueTolerance
+        else:
+            drift = value != goldenValue
+        if drift:
+            flagged.append((name, 'output drift: %s, recorded %s' % (value, goldenValue)))
+
+    for name in sorted(set(golden) - set(results)):
+        print('%-45s recorded but not run' % name)
+
+    if not any(name.startswith('VegetationClassification/') for name in golden):
+        print('The recorded file has no VegetationClassification value, the meanshift '
+              'classification is not checked, record a file on a machine with pymeanshift')
+    if not checkTimes:
+        print('The recorded times are not compared, record a file on this machine to compare them')
+
+    for name, reason in flagged:
+        print('FLAGGED %-37s %s' % (name, reason))
+    if not flagged:
+        print('No slowdown and no output drift' if checkTimes else 'No output drift')
+
+    return flagged
+
+
+def machine_info():
+    ''' Describe the machine the times were measured on '''
+
+    try:
+        import pymeanshift
+        meanshift = True
+    except ImportError:
+        meanshift = False
+
+    return {
+        'date': datetime.date.today().isoformat(),
+        'platform': platform.platform(),
+        'processor': platform.processor() or platform.machine(),
+        'cpus': os.cpu_count(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pymeanshift': meanshift,
+        }
+
+
+def save_benchmark(results, outputJson):
+    with open(outputJson, 'w') as jsonFile:
+        json.dump({'machine': machine_info(), 'cases': results}, jsonFile, indent=1, sort_keys=True)
+
+
+def read_benchmark(inputJson):
+    ''' Return the recorded cases, the machine of the record is printed '''
+
+    with open(inputJson, 'r') as jsonFile:
+        recorded = json.load(jsonFile)
+
+    machine = recorded['machine']
+    print('Recorded on %s, %s, %s cpus, python %s, numpy %s, %s' % (
+        machine['date'], machine['processor'], machine['cpus'], machine['python'],
+        machine['numpy'], machine['platform']))
+    return recorded['cases']
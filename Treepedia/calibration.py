@@ -0,0 +1,157 @@
+# This program is used to calibrate the green view index computed on GSV images smaller
+# than the full size of 400x400 pixels. Smaller images are faster to download and to
+# classify, but the segmentation and the thresholding don't give exactly the same green
+# percentages. For a sample of panoramas, the full size images are classified, and also
+# the images at each of the sizes tested, the bias of the green view
+# index at each size is the difference with the full size green view index.
+
+# The small images can be downsampled locally from the full size images (source
+# 'downsample'), which costs no request, or requested to the API at each size (source
+# 'api'), which costs the requests of every size but measures what a screening run
+# without full size images on disk actually classifies, the API resamples the images
+# itself. The numbers of the 'downsample' source only apply to the downsample path.
+
+# The result can be used to choose config.IMG_SIZE for bulk screening runs.
+
+import json
+import os
+import os.path
+import time
+
+import numpy as np
+
+from . import config
+
+
+SOURCES = ('downsample', 'api')
+
+
+def retreive_api_image(panoID, heading, size):
+    '''
+    Return the image of the panorama requested to the API at the size, or
+    read from the image folder when it was requested before, never
+    downsampled from the full size image
+    '''
+
+    from .GreenViewCalc import get_api_url, get_api_image, get_image_name
+    from .GreenViewCalc import get_image_cache, read_local_image, PITCH
+
+    img_name = get_image_name(panoID, heading, size)
+    cache = get_image_cache()
+    im = read_local_image(img_name, cache)
+    if im is not None:
+        return im
+
+    URL = get_api_url(panoID, heading, PITCH, size)
+    return get_api_image(URL, config.GVIfile['images'] + img_name, cache)
+
+
+def calibrateResolution(GSVinfoFolder, sizes, greenmonth, numPano=50, source='downsample'):
+    '''
+    This function is used to measure the bias of the green view index and the
+    time of the classification for several image sizes, against the full size
+    images.
+
+    Parameters:
+        GSVinfoFolder: the folder of the GSV metadata txt files
+        sizes: the list of image sizes in pixels to calibrate, smaller than 400
+        greenmonth: a list of the green season, greenmonth = ['05','06','07','08','09']
+        numPano: the number of panoramas used for the calibration
+        source: 'downsample' to downsample the full size images locally, 'api'
+            to request the small images to the API
+
+    Return:
+        a dictionary with, for each size, the mean bias, the mean absolute
+        error and the root mean square error of the green view index, and the
+        mean classification time per image in seconds
+    '''
+
+    from .GreenViewCalc import get_pano_lists_from_file, retreive_pano_images
+    from .GreenViewCalc import VegetationClassification, downsample_image
+    from .GreenViewCalc import HEADINGS, PITCH, FULL_SIZE
+    from .panorama import PanoramaHeadingError
+
+    if source not in SOURCES:
+        raise ValueError('The source should be one of %s' % (SOURCES,))
+
+    # the panoramas of the calibration sample
+    panoIDLst = []
+    for txtfile in sorted(os.listdir(GSVinfoFolder)):
+        if not txtfile.endswith('.txt'):
+            continue
+        panoIDLst_tem = get_pano_lists_from_file(
+            os.path.join(GSVinfoFolder, txtfile), greenmonth)[0]
+        panoIDLst = panoIDLst + [p for p in panoIDLst_tem if p not in panoIDLst]
+        if len(panoIDLst) >= numPano:
+            break
+    panoIDLst = panoIDLst[:numPano]
+
+    allSizes = [FULL_SIZE] + [size for size in sizes if size != FULL_SIZE]
+    greenViews = dict((size, []) for size in allSizes)
+    seconds = dict((size, 0.0) for size in allSizes)
+    numImg = 0
+
+    for panoID in panoIDLst:
+        try:
+            images = retreive_pano_images(panoID, HEADINGS, PITCH, FULL_SIZE)
+        except PanoramaHeadingError:
+            raise
+        except BaseException as error:
+            print('Skipping pano %s: %s' % (panoID, error))
+            continue
+
+        try:
+            if source == 'api':
+                sizeImages = dict((size, [retreive_api_image(panoID, heading, size) for heading in HEADINGS])
+                                  for size in allSizes if size != FULL_SIZE)
+            else:
+                sizeImages = dict((size, [downsample_image(im, size) for im in images])
+                                  for size in allSizes if size != FULL_SIZE)
+        except BaseException as error:
+            print('Skipping pano %s: %s' % (panoID, error))
+            continue
+        sizeImages[FULL_SIZE] = images
+
+        for size in allSizes:
+            greenPercent = 0.0
+            for im in sizeImages[size]:
+                start = time.time()
+                greenPercent = greenPercent + VegetationClassification(im)
+                seconds[size] = seconds[size] + time.time() - start
+            greenViews[size].append(greenPercent / len(images))
+
+        numImg = numImg + len(images)
+        print('Calibrated pano %s, %s' % (
+            panoID, ', '.join('%s: %.2f' % (size, greenViews[size][-1]) for size in allSizes)))
+
+    if numImg == 0:
+        print('No panorama could be used for the calibration')
+        return {}
+
+    fullGreenView = np.array(greenViews[FULL_SIZE])
+    result = {}
+    for size in allSizes:
+        diff = np.array(greenViews[size]) - fullGreenView
+        result[size] = {
+            'bias': float(np.mean(diff)),
+            'mae': float(np.mean(np.abs(diff))),
+            'rmse': float(np.sqrt(np.mean(diff ** 2))),
+            'seconds_per_image': seconds[size] / numImg,
+            'pixels': size * size,
+            'panos': len(diff),
+            'source': source,
+            }
+
+    print('size   bias    mae     rmse    s/image (%s)' % source)
+    for size in allSizes:
+        print('%-6s %-7.3f %-7.3f %-7.3f %.4f' % (
+            size, result[size]['bias'], result[size]['mae'],
+            result[size]['rmse'], result[size]['seconds_per_image']))
+
+    return result
+
+
+def save_calibration(result, outputJson):
+    with open(outputJson, 'w') as jsonFile:
+        json.dump(dict((str(size), item) for size, item in result.items()),
+                  jsonFile, indent=1)
@@ -0,0 +1,309 @@
+# The command line interface of Treepedia, one subcommand per stage of the workflow:
+#   python -m Treepedia points       step 1, create the sample points along the streets
+#   python -m Treepedia order        order the sample points along a space filling curve
+#   python -m Treepedia metadata     step 2, collect the GSV metadata of the sample points
+#   python -m Treepedia greenview    step 3, compute the green view index of the panoramas
+#   python -m Treepedia shapefile    step 4, save the green view results as a shapefile
+#   python -m Treepedia tiles        run the steps 1-3 per tile for large areas
+#   python -m Treepedia stream       run the steps 1-4 as a stream in one process
+#   python -m Treepedia cache        show the size of the image cache and evict images
+#   python -m Treepedia calibrate    measure the green view bias of smaller images
+#   python -m Treepedia temporal     compute the green view time series of the sample points
+#   python -m Treepedia plan         estimate the requests, cost and time of a run
+#   python -m Treepedia bench        benchmark the classification and check its results
+#   python -m Treepedia batch        run many areas of a manifest with shared caches and quota
+#   python -m Treepedia adaptive     sample the green view coarse to fine, interpolate the rest
+# The default inputs and outputs are taken from config.py, all relative paths are relative
+# to the root folder (config.root_dir, relative to the package folder like for the numbered
+# scripts run from Treepedia/), except for bench which only reads the files of the
+# repository and runs in the working directory. The stages are only imported by their
+# subcommand.
+
+import argparse
+import os
+import os.path
+
+from . import config
+
+
+def run_points(args):
+    from .createPoints import createPoints
+
+    createPoints(args.input, args.output, args.dist)
+
+
+def run_order(args):
+    from .ordering import orderPoints
+
+    orderPoints(args.input, args.output, args.curve)
+
+
+def run_metadata(args):
+    from .metadataCollector import GSVpanoMetadataCollector
+
+    GSVpanoMetadataCollector(args.input, args.batch, args.output, config.greenmonth)
+
+
+def run_greenview(args):
+    from .GreenViewCalc import GreenViewComputing_ogr_6Horizon
+
+    GreenViewComputing_ogr_6Horizon(args.input, args.output, config.greenmonth, args.size)
+
+
+def run_shapefile(args):
+    from .Greenview2Shp import Read_GVI_res, CreatePointFeature_ogr
+
+    lyrname = 'greenView'
+    [panoIDlist, panoDateList, LonLst, LatLst,
+        greenViewList] = Read_GVI_res(args.input)
+    print('The length of the panoIDList is:', len(panoIDlist))
+
+    CreatePointFeature_ogr(
+        args.output,
+        LonLst,
+        LatLst,
+        panoIDlist,
+        panoDateList,
+        greenViewList,
+        lyrname)
+
+    print('Done!!!')
+
+
+def run_tiles(args):
+    from .tiling import createTiles, runTiles, mergeTiles
+
+    createTiles(args.input, args.tiles, args.size, args.buffer)
+    runTiles(args.tiles, config.POINT_DIST, args.batch, config.greenmonth, args.processes)
+    mergeTiles(args.tiles, args.output)
+
+
+def run_stream(args):
+    from .streaming import streamGreenView, MetadataTxtSink, GreenViewTxtSink, GreenViewShpSink
+
+    sinks = [GreenViewTxtSink(args.output)]
+    if args.metadata:
+        sinks.append(MetadataTxtSink(args.metadata))
+    if args.shapefile:
+        sinks.append(GreenViewShpSink(args.shapefile))
+
+    numPano = streamGreenView(
+        args.input, args.dist, config.greenmonth, sinks,
+        metadataWorkers=args.workers, downloadWorkers=args.workers)
+    print('The number of panoramas is:', numPano)
+
+
+def run_cache(args):
+    from .imageCache import ImageCache
+
+    cache = ImageCache(config.GVIfile['images'], args.max_bytes, args.policy)
+    numDeleted = cache.evict()
+    print('The number of images deleted is:', numDeleted)
+    print('The image cache has %s images, %s bytes' % (cache.count(), cache.total_bytes()))
+    cache.close()
+
+
+def run_calibrate(args):
+    from .calibration import calibrateResolution, save_calibration
+
+    result = calibrateResolution(args.input, args.sizes, config.greenmonth, args.panos, args.source)
+    if result:
+        save_calibration(result, args.output)
+
+
+def run_temporal(args):
+    from .temporal import collectPanoHistory, computeTemporalGreenView
+
+    collectPanoHistory(args.input, args.history, config.greenmonth)
+    computeTemporalGreenView(args.history, args.panos, args.output)
+
+
+def run_plan(args):
+    from .planner import planRun, print_plan
+
+    plan = planRun(args.points, args.metadata, args.results, config.greenmonth,
+                   args.calibration, args.size, args.workers, args.processes)
+    print_plan(plan)
+
+
+def run_bench(args):
+    from .benchmark import runBenchmark, compareBenchmark, save_benchmark, read_benchmark
+    from .benchmark import GOLDEN_FILE, MIN_TIME_DIFFERENCE
+
+    results = runBenchmark(args.repeat)
+    if args.record:
+        save_benchmark(results, args.record)
+    if args.compare:
+        # --compare without a file compares with the golden file of the
+        # repository, its times were measured on another machine and are not
+        # flagged
+        golden = GOLDEN_FILE if args.compare is True else args.compare
+        flagged = compareBenchmark(results, read_benchmark(golden),
+                                   args.time_tolerance, args.value_tolerance,
+                                   MIN_TIME_DIFFERENCE if args.min_time_difference is None
+                                   else args.min_time_difference,
+                                   checkTimes=args.compare is not True)
+        if flagged:
+            raise SystemExit(1)
+
+
+def run_batch(args):
+    from .batch import read_manifest, runBatch
+
+    runBatch(read_manifest(args.manifest), config.greenmonth, args.workers)
+
+
+def run_adaptive(args):
+    from .adaptive import adaptiveGreenView
+
+    adaptiveGreenView(args.input, args.output, args.dist, config.greenmonth,
+                      args.coarse_dist, args.threshold, args.budget, args.workers)
+
+
+def get_root_dir():
+    # relative to the package folder, so python -m Treepedia and the numbered
+    # scripts use the same data folder from any working directory
+    return os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), config.root_dir))
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog='python -m Treepedia',
+        description='Compute the Green View Index of a street network from GSV images')
+    parser.add_argument('--root', default=get_root_dir(),
+                        help='the root folder of the spatial data (default: %(default)s)')
+    subparsers = parser.add_subparsers(dest='command', metavar='command')
+    subparsers.required = True
+
+    points = subparsers.add_parser('points', help='create the sample points along the streets')
+    points.add_argument('--input', default=config.shapefile['input'])
+    points.add_argument('--output', default=config.shapefile['dotted'])
+    points.add_argument('--dist', type=int, default=config.POINT_DIST,
+                        help='the distance between two points in meters')
+    points.set_defaults(func=run_points)
+
+    order = subparsers.add_parser('order', help='order the sample points along a space filling curve')
+    order.add_argument('--input', default=config.shapefile['dotted'])
+    order.add_argument('--output', default=config.shapefile['ordered'])
+    order.add_argument('--curve', choices=['hilbert', 'zorder'], default='hilbert')
+    order.set_defaults(func=run_order)
+
+    metadata = subparsers.add_parser('metadata', help='collect the GSV metadata of the sample points')
+    metadata.add_argument('--input', default=config.shapefile['dotted'])
+    metadata.add_argument('--output', default='.')
+    metadata.add_argument('--batch', type=int, default=1000,
+                          help='the number of points per metadata txt file')
+    metadata.set_defaults(func=run_metadata)
+
+    greenview = subparsers.add_parser('greenview', help='compute the green view index of the panoramas')
+    greenview.add_argument('--input', default='.', help='the folder of the metadata txt files')
+    greenview.add_argument('--output', default=config.GVIfile['data'])
+    greenview.add_argument('--size', type=int, default=config.IMG_SIZE,
+                           help='the size of the images in pixels (default: %(default)s)')
+    greenview.set_defaults(func=run_greenview)
+
+    shapefile = subparsers.add_parser('shapefile', help='save the green view results as a shapefile')
+    shapefile.add_argument('--input', default=config.GVIfile['data'])
+    shapefile.add_argument('--output', default=config.GVIfile['shapefile'])
+    shapefile.set_defaults(func=run_shapefile)
+
+    tiles = subparsers.add_parser('tiles', help='run the steps 1-3 per tile for large areas')
+    tiles.add_argument('--input', default=config.shapefile['input'])
+    tiles.add_argument('--tiles', default=config.shapefile['tiles'])
+    tiles.add_argument('--output', default=os.path.join(config.GVIfile['data'], 'GV_tiles.txt'))
+    tiles.add_argument('--size', type=float, default=config.TILE_SIZE)
+    tiles.add_argument('--buffer', type=float, default=config.TILE_BUFFER)
+    tiles.add_argument('--batch', type=int, default=1000)
+    tiles.add_argument('--processes', type=int, default=1)
+    tiles.set_defaults(func=run_tiles)
+
+    stream = subparsers.add_parser('stream', help='run the steps 1-4 as a stream in one process')
+    stream.add_argument('--input', default=config.shapefile['input'])
+    stream.add_argument('--dist', type=int, default=config.POINT_DIST)
+    stream.add_argument('--output', default=os.path.join(config.GVIfile['data'], 'GV_stream.txt'))
+    stream.add_argument('--metadata', help='also write the metadata in this txt file')
+    stream.add_argument('--shapefile', help='also write the green view in this shapefile')
+    stream.add_argument('--workers', type=int, default=4,
+                        help='the number of threads for the metadata and the images requests')
+    stream.set_defaults(func=run_stream)
+
+    cache = subparsers.add_parser('cache', help='show the size of the image cache and evict images')
+    cache.add_argument('--max-bytes', type=int, default=config.IMAGE_CACHE['max_bytes'])
+    cache.add_argument('--policy', choices=['lru', 'classified'], default=config.IMAGE_CACHE['policy'])
+    cache.set_defaults(func=run_cache)
+
+    calibrate = subparsers.add_parser('calibrate', help='measure the green view bias of smaller images')
+    calibrate.add_argument('--input', default='.', help='the folder of the metadata txt files')
+    calibrate.add_argument('--sizes', type=int, nargs='+', default=[100, 200, 300])
+    calibrate.add_argument('--panos', type=int, default=50,
+                           help='the number of panoramas of the calibration sample')
+    calibrate.add_argument('--source', choices=['downsample', 'api'], default='downsample',
+                           help='downsample the full size images, or request the small images to the API')
+    calibrate.add_argument('--output', default='calibration.json')
+    calibrate.set_defaults(func=run_calibrate)
+
+    temporal = subparsers.add_parser('temporal', help='compute the green view time series of the sample points')
+    temporal.add_argument('--input', default=config.shapefile['dotted'])
+    temporal.add_argument('--history', default='panoHistory.txt',
+                          help='the txt file of the yearly panoramas of the points')
+    temporal.add_argument('--panos', default='GV_panoHistory.txt',
+                          help='the txt file of the green view of the unique panoramas')
+    temporal.add_argument('--output', default='GV_temporal.txt')
+    temporal.set_defaults(func=run_temporal)
+
+    plan = subparsers.add_parser('plan', help='estimate the requests, cost and time of a run')
+    plan.add_argument('--points', default=config.shapefile['dotted'])
+    plan.add_argument('--metadata', default='.', help='the folder of the metadata txt files')
+    plan.add_argument('--results', default=config.GVIfile['data'])
+    plan.add_argument('--calibration', default='calibration.json')
+    plan.add_argument('--size', type=int, default=config.IMG_SIZE)
+    plan.add_argument('--workers', type=int, default=config.PLANNER['workers'])
+    plan.add_argument('--processes', type=int, default=config.PLANNER['processes'])
+    plan.set_defaults(func=run_plan)
+
+    bench = subparsers.add_parser('bench', help='benchmark the classification and check its results')
+    bench.add_argument('--record', help='save the times and the golden values in this json file')
+    bench.add_argument('--compare', nargs='?', const=True,
+                       help='compare with the times and the golden values of this json file '
+                            '(default: the golden file of the repository)')
+    bench.add_argument('--repeat', type=int, default=5)
+    bench.add_argument('--time-tolerance', type=float, default=0.2,
+                       help='the slowdown flagged, as a fraction of the recorded time')
+    bench.add_argument('--min-time-difference', type=float,
+                       help='the slowdown in seconds under which a case is not flagged, the timer '
+                            'noise (default: benchmark.MIN_TIME_DIFFERENCE)')
+    bench.add_argument('--value-tolerance', type=float, default=1e-9,
+                       help='the output drift flagged')
+    # the benchmark only reads the files of the repository
+    bench.set_defaults(func=run_bench, use_root=False)
+
+    batch = subparsers.add_parser('batch', help='run many areas of a manifest with shared caches and quota')
+    batch.add_argument('manifest', help='the json manifest of the areas')
+    batch.add_argument('--workers', type=int,
+                       help='the number of threads, the manifest value by default')
+    batch.set_defaults(func=run_batch)
+
+    adaptive = subparsers.add_parser('adaptive', help='sample the green view coarse to fine, interpolate the rest')
+    adaptive.add_argument('--input', default=config.shapefile['input'])
+    adaptive.add_argument('--output', default='GVI_adaptive.shp')
+    adaptive.add_argument('--dist', type=int, default=config.POINT_DIST,
+                          help='the distance between two sample points in meters')
+    adaptive.add_argument('--coarse-dist', type=float, default=config.ADAPTIVE['coarse_dist'],
+                          help='the distance between the points measured first in meters')
+    adaptive.add_argument('--threshold', type=float, default=config.ADAPTIVE['threshold'],
+                          help='the green view difference of the segments refined')
+    adaptive.add_argument('--budget', type=int, default=config.ADAPTIVE['budget'],
+                          help='the maximum number of image requests')
+    adaptive.add_argument('--workers', type=int, default=4)
+    adaptive.set_defaults(func=run_adaptive)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    # the image folder of config.GVIfile is relative to the root folder
+    if getattr(args, 'use_root', True):
+        os.chdir(args.root)
+    args.func(args)
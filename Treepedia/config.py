@@ -1,16 +1,42 @@
 shapefile = {
     'area': 'Knightswood',
     'input': 'Knightswood_planet_osm_line_lines.shp',
-    'dotted': 'Knightswood_out.shp'
+    'dotted': 'Knightswood_out.shp',
+    'ordered': 'Knightswood_ordered.shp',
+    'tiles': 'Knightswood_tiles'
     }
 
 
 GVIfile = {
     'images':  './imgs_Knightswood/',
     'shapefile': 'GVI_Knightswood.shp',
-    'data': 'greenViewRes'
+    'data': 'greenViewRes',
+    'panoramas': './panos_Knightswood/'
     }
 
+# the acquisition of the images of a panorama, 'static' requests every view
+# to the Static API, 'panorama' renders the views from the full panorama,
+# downloaded once (see panorama.py). The panoramas are resized to
+# PANORAMA_WIDTH pixels (2400 gives the resolution of 400x400 60 degree
+# views). The center column of a panorama faces the heading of the capture
+# vehicle, read per panorama from the "panoID.json" file next to it, set
+# PANORAMA_CENTER_HEADING to a number only if all the panoramas face the
+# same heading
+ACQUISITION = 'static'
+PANORAMA_WIDTH = 2400
+PANORAMA_CENTER_HEADING = None
+
+# byte budget of the image folder, None for no limit, and the eviction policy
+# of the images, 'lru' or 'classified' (see imageCache.py)
+IMAGE_CACHE = {
+    'max_bytes': None,
+    'policy': 'lru'
+    }
+
+# the size in pixels of the GSV images classified, 400 is the full size,
+# smaller images are faster to download and to classify (see calibration.py)
+IMG_SIZE = 400
+
 greenmonth = ['04','05','06','07','08','09']
 
 gcloud_key = 'G3tUr0wnAp1K3y'
@@ -18,3 +44,34 @@ gcloud_key = 'G3tUr0wnAp1K3y'
 POINT_DIST = 50
 
 root_dir = '../spatial-data'
+
+# tile size and overlap buffer in meters (EPSG:3857) for tiled runs, the
+# buffer should not be smaller than the GSV metadata search radius (50m)
+TILE_SIZE = 5000
+TILE_BUFFER = 100
+
+# the estimates of the run planner (planner.py), the price of a request in
+# USD, the API quota, the latency of a request and the classification time of
+# a 400x400 image in seconds (used when no calibration.json is available),
+# the unique panoramas per point before any metadata is collected, and the
+# number of request threads and classification processes
+PLANNER = {
+    'metadata_price': 0.0,
+    'image_price': 0.007,
+    'quota_per_minute': 30000,
+    'request_seconds': 0.3,
+    'seconds_per_image': 2.0,
+    'panos_per_point': 0.9,
+    'workers': 4,
+    'processes': 1
+    }
+
+# the adaptive sampling (adaptive.py), the sample points are first measured
+# every coarse_dist meters, then the segments whose ends differ by more than
+# threshold (green view percent) are split until the budget of image requests
+# (None for no limit) is spent, the other points are interpolated
+ADAPTIVE = {
+    'coarse_dist': 400,
+    'threshold': 5.0,
+    'budget': None
+    }
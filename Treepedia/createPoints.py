@@ -0,0 +1,152 @@
+# This program is used in the first step of the Treepedia project to get points along street
+# network to feed into GSV python scripts for metadata generation.
+# Copyright(C) Ian Seiferling, Xiaojiang Li, Marwa Abdulhai, Senseable City Lab, MIT
+# First version July 21 2017
+
+
+# the types of streets removed from the OSM street network
+HIGHWAYS = {
+    'trunk_link',
+    'tertiary',
+    'motorway',
+    'motorway_link',
+    'steps',
+    None,
+    ' ',
+    'pedestrian',
+    'primary',
+    'primary_link',
+    'footway',
+    'tertiary_link',
+    'trunk',
+    'secondary',
+    'secondary_link',
+    'tertiary_link',
+    'bridleway',
+    'service'}
+
+
+# now run the python file: createPoints.py, the input shapefile has to be
+# in projection of WGS84, 4326
+def createPoints(inshp, outshp, mini_dist):
+    '''
+    This function will parse throigh the street network of provided city and
+    clean all highways and create points every mini_dist meters (or as specified) along
+    the linestrings
+    Required modules: Fiona and Shapely
+
+    parameters:
+        inshp: the input linear shapefile, must be in WGS84 projection, ESPG: 4326
+        output: the result point feature class
+        mini_dist: the minimum distance between two created point
+
+    '''
+
+    import fiona
+    from shapely.geometry import mapping
+    from fiona.crs import from_epsg
+
+    schema = {
+        'geometry': 'Point',
+        'properties': {'id': 'int'},
+    }
+
+    # Create pointS along the streets
+    with fiona.Env():
+        with fiona.open(outshp, 'w', crs=from_epsg(4326), driver='ESRI Shapefile', schema=schema) as output:
+            for point in iter_points(inshp, mini_dist):
+                output.write({'geometry': mapping(
+                    point), 'properties': {'id': 1}})
+
+    print("Process Complete")
+
+
+def iter_points(inshp, mini_dist):
+    '''
+    This function is a generator of the points created every mini_dist meters
+    along the streets of the street network, the highways are skipped. The points
+    are shapely points in WGS84, they are created one street at a time.
+
+    parameters:
+        inshp: the input linear shapefile, must be in WGS84 projection, ESPG: 4326
+        mini_dist: the minimum distance between two created point
+
+    '''
+    from shapely.ops import transform
+
+    project2 = get_projections()[1]
+
+    for line2 in iter_streets(inshp):
+        for distance in range(0, int(line2.length), mini_dist):
+            yield transform(project2, line2.interpolate(distance))
+
+
+def get_projections():
+    '''
+    Return the transforms from WGS84 to the pseudo mercator (EPSG:3857, in
+    meters) and back
+    '''
+    import warnings
+    # Annoying library warning
+    warnings.simplefilter(action='ignore', category=FutureWarning)
+
+    from functools import partial
+    import pyproj
+
+    # convert degree to meter, in order to split by distance in meter
+    project = partial(
+        pyproj.transform, pyproj.Proj(
+            init='EPSG:4326'), pyproj.Proj(
+            init='EPSG:3857'))  # 3857 is psudo WGS84 the unit is meter
+
+    # convert the local projection back the the WGS84
+    project2 = partial(pyproj.transform, pyproj.Proj(
+        init='EPSG:3857'), pyproj.Proj(init='EPSG:4326'))
+
+    return project, project2
+
+
+def iter_streets(inshp):
+    '''
+    This function is a generator of the streets of the street network, the
+    highways are skipped. The streets are shapely lines in the pseudo mercator
+    projection (EPSG:3857), in meters.
+
+    parameters:
+        inshp: the input linear shapefile, must be in WGS84 projection, ESPG: 4326
+
+    '''
+
+    import fiona
+    import sys
+    from shapely.geometry import shape
+    from shapely.ops import transform
+
+    project = get_projections()[0]
+
+    with fiona.open(inshp) as source:
+        # clean the original street maps by removing highways, if it the street
+        # map not from Open street data, users'd better to clean the data
+        # themselve
+        key = list(source.schema['properties'].keys())[0]
+
+        for line in source:
+            try:
+                i = line['properties']['highway']  # for the OSM street data
+            except BaseException:
+                # if the street map is not osm, do nothing. You'd better to clean the street map, if you don't want to map the GVI for highways
+                i = line['properties'][key]
+            if i in HIGHWAYS:
+                continue
+
+            try:
+                first = shape(line['geometry'])
+                line2 = transform(project, first)
+            except (KeyboardInterrupt, SystemExit):
+                raise
+            except BaseException:
+                print("You should make sure the input shapefile is WGS84")
+                print(sys.exc_info())
+                continue
+
+            yield line2
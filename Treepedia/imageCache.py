@@ -0,0 +1,202 @@
+# This program is used to keep the folder of the GSV images within a fixed disk size. The
+# images saved by GreenViewCalc.retreive_image are recorded in an index, a sqlite file in
+# the image folder, with their size, the time they were last used and whether their
+# panorama has been classified. When the images take more than the byte budget, images
+# are deleted following the eviction policy:
+#   'lru': the least recently used images are deleted first
+#   'classified': only the images of classified panoramas are deleted, least recently
+#                 used first, the images waiting for their classification are kept
+# The index is shared by the threads and the processes using the same image folder.
+# Every cache keeps a running total of the bytes of the index, loaded when it is opened,
+# and the index is only queried for the images to delete when the total is over budget.
+# The eviction then frees EVICT_MARGIN of the budget more than needed, so that it does
+# not run again for every new image.
+
+import os
+import os.path
+import sqlite3
+import threading
+import time
+
+
+INDEX_FILE = 'imageCache.sqlite'
+POLICIES = ('lru', 'classified')
+EVICT_MARGIN = 0.1
+
+_caches = {}
+_cachesLock = threading.Lock()
+
+
+def get_cache(folder, maxBytes, policy='lru'):
+    '''
+    Return the image cache of the folder, one cache is created per folder
+    and per process
+    '''
+
+    with _cachesLock:
+        if folder not in _caches:
+            _caches[folder] = ImageCache(folder, maxBytes, policy)
+        return _caches[folder]
+
+
+class ImageCache(object):
+    '''
+    The index of the images of an image folder, with a byte budget.
+
+    Parameters:
+        folder: the image folder
+        maxBytes: the maximum size of the images in bytes
+        policy: the eviction policy, 'lru' or 'classified'
+    '''
+
+    def __init__(self, folder, maxBytes, policy='lru'):
+        if policy not in POLICIES:
+            raise ValueError('The eviction policy should be one of %s' % (POLICIES,))
+
+        self.folder = folder
+        self.maxBytes = maxBytes
+        self.policy = policy
+        self.lock = threading.Lock()
+
+        os.makedirs(folder, exist_ok=True)
+        indexfile = os.path.join(folder, INDEX_FILE)
+        isNew = not os.path.exists(indexfile)
+
+        self.db = sqlite3.connect(indexfile, timeout=60, check_same_thread=False)
+        with self.lock, self.db:
+            self.db.execute(
+                'CREATE TABLE IF NOT EXISTS images ('
+                'name TEXT PRIMARY KEY, size INTEGER, used REAL, classified INTEGER)')
+            self.db.execute('CREATE INDEX IF NOT EXISTS images_used ON images (used)')
+
+        # the images downloaded before the index existed
+        if isNew:
+            self._index_folder()
+
+        with self.lock:
+            self.totalBytes = self.db.execute('SELECT SUM(size) FROM images').fetchone()[0] or 0
+
+    def _index_folder(self):
+        rows = []
+        for name in os.listdir(self.folder):
+            path = os.path.join(self.folder, name)
+            if name.endswith('.jpg') and os.path.isfile(path):
+                rows.append((name, os.path.getsize(path), os.path.getmtime(path), 0))
+
+        with self.lock, self.db:
+            self.db.executemany(
+                'INSERT OR REPLACE INTO images VALUES (?, ?, ?, ?)', rows)
+
+    def path(self, name):
+        return os.path.join(self.folder, name)
+
+    def get(self, name):
+        '''
+        Return the path of the image if it is in the cache, None otherwise
+        '''
+
+        path = self.path(name)
+        with self.lock, self.db:
+            row = self.db.execute(
+                'SELECT size FROM images WHERE name = ?', (name,)).fetchone()
+            if row is None:
+                return None
+
+            # in case the image was deleted by hand
+            if not os.path.isfile(path):
+                self.db.execute('DELETE FROM images WHERE name = ?', (name,))
+                self.totalBytes = self.totalBytes - row[0]
+                return None
+
+            self.db.execute(
+                'UPDATE images SET used = ? WHERE name = ?', (time.time(), name))
+
+        return path
+
+    def put(self, name, image):
+        '''
+        Save the PIL image in the cache, and evict images if the cache is
+        over its byte budget
+        '''
+
+        path = self.path(name)
+        image.save(path)
+
+        size = os.path.getsize(path)
+        with self.lock, self.db:
+            row = self.db.execute(
+                'SELECT size FROM images WHERE name = ?', (name,)).fetchone()
+            self.db.execute(
+                'INSERT OR REPLACE INTO images VALUES (?, ?, ?, 0)',
+                (name, size, time.time()))
+            self.totalBytes = self.totalBytes + size - (row[0] if row else 0)
+            overBudget = self.maxBytes is not None and self.totalBytes > self.maxBytes
+
+        if overBudget:
+            self.evict()
+        return path
+
+    def mark_classified(self, names):
+        with self.lock, self.db:
+            self.db.executemany(
+                'UPDATE images SET classified = 1 WHERE name = ?',
+                [(name,) for name in names])
+
+        if self.policy == 'classified' and self.maxBytes is not None and self.totalBytes > self.maxBytes:
+            self.evict()
+
+    def total_bytes(self):
+        with self.lock:
+            total = self.db.execute('SELECT SUM(size) FROM images').fetchone()[0]
+        return total or 0
+
+    def count(self):
+        with self.lock:
+            return self.db.execute('SELECT COUNT(*) FROM images').fetchone()[0]
+
+    def evict(self):
+        '''
+        Delete images following the eviction policy until the images fit in
+        the byte budget less EVICT_MARGIN, return the number of images deleted
+        '''
+
+        if self.maxBytes is None:
+            return 0
+
+        if self.policy == 'classified':
+            query = 'SELECT name, size FROM images WHERE classified = 1 ORDER BY used'
+        else:
+            query = 'SELECT name, size FROM images ORDER BY used'
+
+        numDeleted = 0
+        with self.lock, self.db:
+            # the other processes sharing the index also add images, the
+            # running total is synchronized before the eviction
+            total = self.db.execute('SELECT SUM(size) FROM images').fetchone()[0] or 0
+            self.totalBytes = total
+            if total <= self.maxBytes:
+                return 0
+
+            target = self.maxBytes * (1 - EVICT_MARGIN)
+            evicted = []
+            for name, size in self.db.execute(query):
+                if total <= target:
+                    break
+                evicted.append((name,))
+                total = total - size
+
+            for name, in evicted:
+                try:
+                    os.remove(self.path(name))
+                except OSError:
+                    pass
+                numDeleted = numDeleted + 1
+
+            self.db.executemany('DELETE FROM images WHERE name = ?', evicted)
+            self.totalBytes = total
+
+        return numDeleted
+
+    def close(self):
+        with self.lock:
+            self.db.close()
@@ -0,0 +1,137 @@
+# This program is used to order the sample points along a space filling curve, the
+# Hilbert curve or the Z-order curve. The metadata collector processes the points by
+# batches of consecutive features, with the points of the shapefile in the order of the
+# streets a batch is scattered across the city. Along the curve, consecutive points are
+# close to each other, so every batch covers a compact area, and the panoramas shared by
+# neighbouring points are found in the same batch.
+
+# The position of each point in the input shapefile is kept in the field 'origID'.
+
+import numpy as np
+
+from .tiling import lonlat_to_mercator
+
+
+CURVES = ('hilbert', 'zorder')
+
+
+def hilbert_index(x, y, order):
+    '''
+    Return the index along the Hilbert curve of the cells (x, y) of a grid of
+    2**order by 2**order cells, x and y are integer numpy arrays
+    '''
+
+    x = np.array(x, dtype=np.int64)
+    y = np.array(y, dtype=np.int64)
+    n = 1 << order
+    d = np.zeros(x.shape, dtype=np.int64)
+
+    s = n >> 1
+    while s > 0:
+        rx = (x & s) > 0
+        ry = (y & s) > 0
+        d += s * s * ((3 * rx) ^ ry)
+
+        # rotate the quadrant
+        flip = ~ry & rx
+        x = np.where(flip, n - 1 - x, x)
+        y = np.where(flip, n - 1 - y, y)
+        x, y = np.where(~ry, y, x), np.where(~ry, x, y)
+        s >>= 1
+
+    return d
+
+
+def zorder_index(x, y, order):
+    '''
+    Return the index along the Z-order curve of the cells (x, y) of a grid of
+    2**order by 2**order cells, x and y are integer numpy arrays
+    '''
+
+    x = np.array(x, dtype=np.int64)
+    y = np.array(y, dtype=np.int64)
+    d = np.zeros(x.shape, dtype=np.int64)
+
+    for bit in range(order):
+        d |= ((x >> bit) & 1) << (2 * bit)
+        d |= ((y >> bit) & 1) << (2 * bit + 1)
+
+    return d
+
+
+def curve_order(xs, ys, curve='hilbert', order=16):
+    '''
+    Return the positions of the points sorted along the curve, the points are
+    snapped to a grid of 2**order cells over their bounding box
+
+    Parameters:
+        xs, ys: the coordinates of the points
+        curve: 'hilbert' or 'zorder'
+        order: the number of bits of the grid cells on each axis
+    '''
+
+    if curve not in CURVES:
+        raise ValueError('The curve should be one of %s' % (CURVES,))
+
+    xs = np.asarray(xs, dtype=np.float64)
+    ys = np.asarray(ys, dtype=np.float64)
+    if len(xs) == 0:
+        return np.zeros(0, dtype=np.intp)
+
+    # the same scale on both axes, to keep the cells square
+    cells = (1 << order) - 1
+    extent = max(xs.max() - xs.min(), ys.max() - ys.min()) or 1.0
+    gx = np.floor((xs - xs.min()) / extent * cells).astype(np.int64)
+    gy = np.floor((ys - ys.min()) / extent * cells).astype(np.int64)
+
+    if curve == 'hilbert':
+        index = hilbert_index(gx, gy, order)
+    else:
+        index = zorder_index(gx, gy, order)
+
+    # stable, the points of the same cell keep their order
+    return np.argsort(index, kind='stable')
+
+
+def orderPoints(inshp, outshp, curve='hilbert', order=16):
+    '''
+    This function is used to write the sample points in the order of the
+    space filling curve, the position of each point in the input shapefile is
+    saved in the field origID.
+
+    Required modules: Fiona
+
+    parameters:
+        inshp: the input point shapefile, in WGS84 projection, ESPG: 4326
+        outshp: the output point shapefile
+        curve: 'hilbert' or 'zorder'
+        order: the number of bits of the grid cells on each axis
+
+    '''
+
+    import fiona
+
+    with fiona.open(inshp) as source:
+        features = list(source)
+        crs = source.crs
+        driver = source.driver
+        schema = dict(source.schema)
+
+    xs = []
+    ys = []
+    for feat in features:
+        x, y = lonlat_to_mercator(*feat['geometry']['coordinates'][:2])
+        xs.append(x)
+        ys.append(y)
+
+    schema['properties'] = dict(schema['properties'])
+    schema['properties']['origID'] = 'int'
+
+    with fiona.open(outshp, 'w', driver=driver, crs=crs, schema=schema) as output:
+        for idx in curve_order(xs, ys, curve, order):
+            feat = features[idx]
+            properties = dict(feat['properties'])
+            properties['origID'] = int(idx)
+            output.write({'geometry': feat['geometry'], 'properties': properties})
+
+    print('Ordered %s points along the %s curve' % (len(features), curve))
@@ -0,0 +1,215 @@
+# This program is used to render the GSV views locally from the full equirectangular
+# panorama, instead of requesting every view to the Static API. The panorama is read
+# once from the panorama folder (config.GVIfile['panoramas']), or downloaded once with
+# the tiles of the streetview package, then the 60 degree perspective views of all the
+# headings are rendered by a vectorized reprojection and classified as usual. One
+# panorama replaces the six image requests of a site, and views of any heading and
+# pitch are available without other downloads.
+
+# A panorama is an equirectangular image, twice as wide as high, the columns go from
+# heading centerHeading - 180 on the left to centerHeading + 180 on the right, and the
+# rows from pitch 90 at the top to pitch -90 at the bottom. The center column faces the
+# heading of the capture vehicle, which is different for every panorama, it is saved in
+# a "panoID.json" file next to the panorama, {"heading": 123.4}, so that the views are
+# rendered at the same compass headings as the views of the Static API. When the file
+# is missing, the heading is fetched from the metadata of the panorama and saved, the
+# file can also be written along with the panoramas prepared by other means. When the
+# heading cannot be fetched, the run stops with PanoramaHeadingError rather than
+# scoring the panoramas as failed, as the photometa service is not documented and a
+# change of its format would fail every panorama.
+
+import json
+import os
+import os.path
+
+import numpy as np
+from PIL import Image
+
+from . import config
+
+
+def render_view(panorama, heading, pitch=0, fov=60, size=400, centerHeading=180.0):
+    '''
+    This function is used to render the perspective view of the panorama in
+    the direction of heading and pitch, with a horizontal field of view of fov
+    degrees, like the images of the Static API.
+
+    Parameters:
+        panorama: the equirectangular panorama, numpy array (height, width, 3)
+        heading: the heading of the view in degrees, 0 is north
+        pitch: the pitch of the view in degrees, positive is up
+        fov: the horizontal field of view in degrees
+        size: the width and height of the view in pixels
+        centerHeading: the heading of the center column of the panorama
+
+    Return:
+        the view as a uint8 numpy array (size, size, 3)
+    '''
+
+    height, width = panorama.shape[:2]
+
+    # the ray of every pixel in the camera frame, x to the right, y up and
+    # z forward, the focal length gives the field of view
+    focal = 0.5 * size / np.tan(np.radians(fov) / 2)
+    coords = np.arange(size) - (size - 1) / 2.0
+    x, y = np.meshgrid(coords, -coords)
+
+    # tilt the rays by the pitch
+    pitchRad = np.radians(pitch)
+    yRot = y * np.cos(pitchRad) + focal * np.sin(pitchRad)
+    zRot = focal * np.cos(pitchRad) - y * np.sin(pitchRad)
+
+    # the heading and the pitch of every ray
+    rayHeading = np.degrees(np.arctan2(x, zRot)) + heading
+    rayPitch = np.degrees(np.arctan2(yRot, np.hypot(x, zRot)))
+    del x, y, yRot, zRot
+
+    # the position of the rays in the panorama, in pixels, with the pixel
+    # centers at the half pixels
+    col = ((rayHeading - centerHeading + 180.0) % 360.0) / 360.0 * width - 0.5
+    row = (90.0 - rayPitch) / 180.0 * height - 0.5
+    del rayHeading, rayPitch
+
+    # bilinear interpolation, the columns wrap around the panorama
+    col0 = np.floor(col).astype(np.intp)
+    row0 = np.floor(row).astype(np.intp)
+    wCol = (col - col0)[:, :, np.newaxis]
+    wRow = (row - row0)[:, :, np.newaxis]
+    col1 = (col0 + 1) % width
+    col0 = col0 % width
+    row1 = np.clip(row0 + 1, 0, height - 1)
+    row0 = np.clip(row0, 0, height - 1)
+
+    view = (panorama[row0, col0] * (1 - wCol) + panorama[row0, col1] * wCol) * (1 - wRow)
+    view += (panorama[row1, col0] * (1 - wCol) + panorama[row1, col1] * wCol) * wRow
+
+    return np.clip(np.rint(view), 0, 255).astype(np.uint8)
+
+
+def get_panorama_path(panoID):
+    return config.GVIfile['panoramas'] + str(panoID) + '.jpg'
+
+
+def get_heading_path(panoID):
+    return config.GVIfile['panoramas'] + str(panoID) + '.json'
+
+
+class PanoramaHeadingError(Exception):
+    pass
+
+
+def parse_panorama_heading(text, panoID):
+    '''
+    Return the heading of the center column of the panorama from the answer
+    of the photometa service, a json list following a )]}' line, the heading
+    is the first item of the orientation of the panorama. The service is not
+    documented, PanoramaHeadingError is raised when the answer does not have
+    this format any more, instead of rendering every view at a wrong heading.
+    '''
+
+    try:
+        data = json.loads(text.split('\n', 1)[1])
+        return float(data[1][0][5][0][1][2][0])
+    except (IndexError, KeyError, TypeError, ValueError):
+        raise PanoramaHeadingError(
+            'No heading in the photometa answer of the panorama %s, the format of the answer '
+            'may have changed. Write the heading of the panorama in %s, {"heading": 123.4}, '
+            'or set config.PANORAMA_CENTER_HEADING' % (panoID, get_heading_path(panoID)))
+
+
+def fetch_panorama_heading(panoID):
+    '''
+    Return the heading of the center column of the panorama, the yaw of the
+    capture vehicle, from the photometa service of Google Maps
+    '''
+
+    import requests
+
+    url = ('https://www.google.com/maps/photometa/v1?authuser=0&hl=en&gl=us'
+           '&pb=!1m4!1smaps_sv.tactile!11m2!2m1!1b1!2m2!1sen!2sus'
+           '!3m3!1m2!1e2!2s%s!4m6!1e1!1e2!1e3!1e4!1e8!1e6' % panoID)
+    try:
+        response = requests.get(url, timeout=30)
+        response.raise_for_status()
+    except requests.RequestException as error:
+        raise PanoramaHeadingError(
+            'The heading of the panorama %s could not be fetched: %s. Write it in %s, '
+            '{"heading": 123.4}, or set config.PANORAMA_CENTER_HEADING' % (
+                panoID, error, get_heading_path(panoID)))
+
+    return parse_panorama_heading(response.text, panoID)
+
+
+def save_panorama_heading(panoID, heading):
+    with open(get_heading_path(panoID), 'w') as jsonFile:
+        json.dump({'heading': heading}, jsonFile)
+
+
+def read_panorama_heading(panoID):
+    '''
+    Return the heading of the center column of the panorama, from
+    config.PANORAMA_CENTER_HEADING when it is set, or from the panoID.json
+    file, fetched and saved when it is missing
+    '''
+
+    if config.PANORAMA_CENTER_HEADING is not None:
+        return config.PANORAMA_CENTER_HEADING
+
+    headingPath = get_heading_path(panoID)
+    if os.path.isfile(headingPath):
+        with open(headingPath, 'r') as jsonFile:
+            return float(json.load(jsonFile)['heading'])
+
+    heading = fetch_panorama_heading(panoID)
+    save_panorama_heading(panoID, heading)
+    return heading
+
+
+def download_panorama(panoID, img_path):
+    '''
+    Download the tiles of the panorama with the streetview package, stitch
+    them and save the panorama, resized to config.PANORAMA_WIDTH pixels
+    '''
+
+    import shutil
+    import tempfile
+    import streetview
+
+    tileFolder = tempfile.mkdtemp()
+    try:
+        tiles = streetview.tiles_info(panoID)
+        streetview.download_tiles(tiles, tileFolder)
+        streetview.stich_tiles(panoID, tiles, tileFolder, tileFolder)
+
+        image = Image.open(os.path.join(tileFolder, '%s.jpg' % panoID))
+        width = config.PANORAMA_WIDTH
+        image = image.resize((width, width // 2), Image.LANCZOS)
+
+        os.makedirs(os.path.dirname(img_path), exist_ok=True)
+        image.save(img_path)
+    finally:
+        shutil.rmtree(tileFolder, ignore_errors=True)
+
+    return np.array(image)
+
+
+def retreive_panorama(panoID):
+    ''' Read the panorama from the panorama folder, or download it '''
+
+    img_path = get_panorama_path(panoID)
+    if os.path.isfile(img_path):
+        return np.array(Image.open(img_path).convert('RGB'))
+    else:
+        return download_panorama(panoID, img_path)
+
+
+def render_pano_views(panoID, headingArr, pitch, size):
+    '''
+    Render the views of the panorama for all the headings, the panorama is
+    read or downloaded once, the headings are compass headings
+    '''
+
+    panorama = retreive_panorama(panoID)
+    centerHeading = read_panorama_heading(panoID)
+    return [render_view(panorama, heading, pitch, 60, size, centerHeading)
+            for heading in headingArr]
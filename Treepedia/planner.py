@@ -0,0 +1,211 @@
+# This program is used to plan a run before spending the API quota. It reads the sample
+# points created by createPoints, the metadata txt files, the green view result txt files
+# and the image folder, and estimates what is still to be done:
+#   - the number of points already resolved, and the metadata requests still needed
+#   - the number of unique panoramas expected after the de-duplication
+#   - the image requests still needed, the images in the image folder are not counted
+#   - the classification time, from the time per image measured by calibration.py
+#   - the cost of the requests and the wall clock time under the quota and workers
+# The prices, quotas and default timings are set in config.PLANNER.
+
+import json
+import os
+import os.path
+import re
+
+from . import config
+
+
+def count_points(samplesShp):
+    import fiona
+
+    with fiona.open(samplesShp) as source:
+        return len(source)
+
+
+def read_metadata_folder(GSVinfoFolder, greenmonth):
+    '''
+    Return the number of points resolved by the metadata txt files of the
+    folder, and the unique green month panoramas found
+    '''
+
+    from .GreenViewCalc import get_pano_lists_from_file
+
+    numResolved = 0
+    panoIDs = set()
+    if not os.path.isdir(GSVinfoFolder):
+        return numResolved, panoIDs
+
+    for txtfile in os.listdir(GSVinfoFolder):
+        match = re.match(r'Pnt_start(\d+)_end(\d+)\.txt$', txtfile)
+        if match is None:
+            continue
+
+        numResolved = numResolved + int(match.group(2)) - int(match.group(1))
+        panoIDLst = get_pano_lists_from_file(
+            os.path.join(GSVinfoFolder, txtfile), greenmonth)[0]
+        panoIDs.update(panoIDLst)
+
+    return numResolved, panoIDs
+
+
+def read_result_folder(GVI_Res, size):
+    '''
+    Return the panoramas with a valid green view in the result txt files of
+    the image size, named by GreenViewCalc.get_result_name, the results of
+    the other sizes are not counted
+    '''
+
+    from .GreenViewCalc import get_result_name
+    from .Greenview2Shp import read_green_views
+
+    panoIDs = set()
+    if not os.path.isdir(GVI_Res):
+        return panoIDs
+
+    for txtfile in os.listdir(GVI_Res):
+        match = re.match(r'GV_(\d+px_)?(.+\.txt)$', txtfile)
+        if match is None or txtfile != get_result_name(match.group(2), size):
+            continue
+        panoIDs.update(read_green_views(os.path.join(GVI_Res, txtfile)))
+
+    return panoIDs
+
+
+def count_missing_images(panoIDs, size):
+    ''' Return the number of images of the panoramas not in the image folder '''
+
+    from .GreenViewCalc import get_image_name, HEADINGS, FULL_SIZE
+
+    # one full panorama per panorama, instead of one image per heading
+    if config.ACQUISITION == 'panorama':
+        from .panorama import get_panorama_path
+        return sum(1 for panoID in panoIDs if not os.path.isfile(get_panorama_path(panoID)))
+
+    folder = config.GVIfile['images']
+    numMissing = 0
+    for panoID in panoIDs:
+        for heading in HEADINGS:
+            if os.path.isfile(folder + get_image_name(panoID, heading, size)):
+                continue
+            # the small images can be downsampled from the full size images
+            if size < FULL_SIZE and os.path.isfile(folder + get_image_name(panoID, heading)):
+                continue
+            numMissing = numMissing + 1
+
+    return numMissing
+
+
+def read_seconds_per_image(calibrationJson, size):
+    ''' Return the classification time per image measured by calibration.py '''
+
+    if calibrationJson is None or not os.path.exists(calibrationJson):
+        return None
+
+    with open(calibrationJson, 'r') as jsonFile:
+        calibration = json.load(jsonFile)
+
+    if str(size) not in calibration:
+        return None
+    return calibration[str(size)]['seconds_per_image']
+
+
+def planRun(samplesShp, GSVinfoFolder, GVI_Res, greenmonth, calibrationJson=None,
+            size=None, workers=None, processes=None):
+    '''
+    This function is used to estimate the requests, the cost and the time of a
+    run, without calling the API.
+
+    Parameters:
+        samplesShp: the shapefile of the sample points created by createPoints
+        GSVinfoFolder: the folder of the metadata txt files
+        GVI_Res: the folder of the green view result txt files, only the files of the size are read
+        greenmonth: a list of the green season, greenmonth = ['05','06','07','08','09']
+        calibrationJson: the output of calibration.py, for the time per image
+        size: the size of the images in pixels, config.IMG_SIZE by default
+        workers: the number of threads sending requests
+        processes: the number of processes classifying images
+
+    Return:
+        a dictionary of the estimates
+    '''
+
+    from .GreenViewCalc import HEADINGS
+
+    planner = config.PLANNER
+    if size is None:
+        size = config.IMG_SIZE
+    if workers is None:
+        workers = planner['workers']
+    if processes is None:
+        processes = planner['processes']
+
+    numPoints = count_points(samplesShp)
+    numResolved, metadataPanos = read_metadata_folder(GSVinfoFolder, greenmonth)
+    numResolved = min(numResolved, numPoints)
+    donePanos = read_result_folder(GVI_Res, size)
+
+    # the unique panoramas per point seen so far, for the points not resolved
+    if numResolved > 0:
+        panosPerPoint = len(metadataPanos) / float(numResolved)
+    else:
+        panosPerPoint = planner['panos_per_point']
+
+    metadataRequests = numPoints - numResolved
+    knownPanos = metadataPanos - donePanos
+    newPanos = int(round(metadataRequests * panosPerPoint))
+    requestsPerPano = 1 if config.ACQUISITION == 'panorama' else len(HEADINGS)
+    imageRequests = count_missing_images(knownPanos, size) + newPanos * requestsPerPano
+    numImages = (len(knownPanos) + newPanos) * len(HEADINGS)
+
+    secondsPerImage = read_seconds_per_image(calibrationJson, size)
+    if secondsPerImage is None:
+        secondsPerImage = planner['seconds_per_image'] * (size / 400.0) ** 2
+    cpuSeconds = numImages * secondsPerImage
+
+    # the request rate is limited by the quota and by the latency of the
+    # requests sent by the workers
+    requestsPerSecond = min(planner['quota_per_minute'] / 60.0,
+                            workers / float(planner['request_seconds']))
+    requestSeconds = (metadataRequests + imageRequests) / requestsPerSecond
+    classifySeconds = cpuSeconds / processes
+
+    plan = {
+        'points': numPoints,
+        'points_resolved': numResolved,
+        'panos_per_point': panosPerPoint,
+        'panos_done': len(donePanos),
+        'panos_todo': len(knownPanos) + newPanos,
+        'metadata_requests': metadataRequests,
+        'image_requests': imageRequests,
+        'cost': metadataRequests * planner['metadata_price'] + imageRequests * planner['image_price'],
+        'cpu_seconds': cpuSeconds,
+        'seconds_per_image': secondsPerImage,
+        # the stream overlaps the requests and the classification, the step
+        # by step workflow does them one after the other
+        'wall_seconds_stream': max(requestSeconds, classifySeconds),
+        'wall_seconds_steps': requestSeconds + classifySeconds,
+        }
+
+    return plan
+
+
+def format_duration(seconds):
+    hours, seconds = divmod(int(seconds), 3600)
+    minutes, seconds = divmod(seconds, 60)
+    return '%dh%02dm%02ds' % (hours, minutes, seconds)
+
+
+def print_plan(plan):
+    print('Sample points:              %s' % plan['points'])
+    print('Points already resolved:    %s' % plan['points_resolved'])
+    print('Unique panos per point:     %.3f' % plan['panos_per_point'])
+    print('Panoramas already computed: %s' % plan['panos_done'])
+    print('Panoramas to compute:       %s' % plan['panos_todo'])
+    print('Metadata requests:          %s' % plan['metadata_requests'])
+    print('Image requests:             %s' % plan['image_requests'])
+    print('Cost of the requests:       %.2f' % plan['cost'])
+    print('Classification CPU time:    %s (%.3fs per image)' % (
+        format_duration(plan['cpu_seconds']), plan['seconds_per_image']))
+    print('Wall clock, stream:         %s' % format_duration(plan['wall_seconds_stream']))
+    print('Wall clock, step by step:   %s' % format_duration(plan['wall_seconds_steps']))
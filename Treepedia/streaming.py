@@ -0,0 +1,308 @@
+# This program is used to run the steps 1-4 of Treepedia in one process as a stream, the
+# sample points are created, their GSV metadata collected, the images downloaded and
+# classified, and the green view results written, one panorama after the other. The
+# steps are chained with generators, and with bounded queues between the steps run
+# by worker threads (metadata and image requests), so the first green view results
+# are written within seconds and the memory used doesn't grow with the number of
+# sample points, only the set of the panorama ids already seen grows.
+
+# The txt files and the shapefile of the step by step workflow can still be written,
+# by giving the corresponding sinks to streamGreenView.
+
+# The txt sinks append to their files, and the panoramas already in the green view txt
+# file with a valid green view are skipped, so an interrupted stream can be restarted.
+# The metadata of all the points is requested again, the shapefile sink only holds the
+# panoramas of the last run, convert the txt file with Greenview2Shp for all of them.
+
+import os
+import os.path
+import queue
+import sys
+import threading
+
+
+_DONE = object()
+
+
+class _Failure(object):
+    # an exception raised in a worker thread, raised again by the consumer
+    def __init__(self, error):
+        self.error = error
+
+
+def threaded_map(func, items, workers, maxsize):
+    '''
+    This function is a generator applying func to the items with several
+    worker threads, the results are yielded in the order they are ready and
+    the None results are dropped. The items are read from the iterable by a
+    single feeder thread, at most maxsize items wait in each queue.
+    '''
+
+    inQueue = queue.Queue(maxsize)
+    outQueue = queue.Queue(maxsize)
+
+    def feed():
+        try:
+            for item in items:
+                inQueue.put(item)
+        except BaseException as error:
+            outQueue.put(_Failure(error))
+        finally:
+            for w in range(workers):
+                inQueue.put(_DONE)
+
+    def work():
+        while True:
+            item = inQueue.get()
+            if item is _DONE:
+                break
+            try:
+                result = func(item)
+            except BaseException as error:
+                result = _Failure(error)
+            if result is not None:
+                outQueue.put(result)
+        outQueue.put(_DONE)
+
+    threads = [threading.Thread(target=feed, daemon=True)]
+    threads += [threading.Thread(target=work, daemon=True) for w in range(workers)]
+    for thread in threads:
+        thread.start()
+
+    running = workers
+    while running > 0:
+        result = outQueue.get()
+        if result is _DONE:
+            running = running - 1
+        elif isinstance(result, _Failure):
+            raise result.error
+        else:
+            yield result
+
+
+class MetadataTxtSink(object):
+    '''
+    Write the metadata of the panoramas in a txt file, with the format of the
+    output of metadataCollector
+    '''
+
+    stage = 'metadata'
+
+    def __init__(self, txtfilename):
+        # the panoramas already written by a previous run
+        self.written = set()
+        if os.path.exists(txtfilename):
+            with open(txtfilename, 'r') as txtfile:
+                self.written = set(line.split(' ')[1]
+                                   for line in txtfile if 'panoDate' in line)
+        self.txtfile = open(txtfilename, 'a')
+
+    def write(self, pano):
+        if pano['panoID'] in self.written:
+            return
+        self.written.add(pano['panoID'])
+
+        lineTxt = 'panoID: %s panoDate: %s longitude: %s latitude: %s\n' % (
+            pano['panoID'], pano['panoDate'], pano['lon'], pano['lat'])
+        self.txtfile.write(lineTxt)
+        self.txtfile.flush()
+
+    def close(self):
+        self.txtfile.close()
+
+
+class GreenViewTxtSink(object):
+    '''
+    Write the green view results in a txt file, with the format of the output
+    of GreenViewCalc, the file can be converted by Greenview2Shp
+    '''
+
+    stage = 'greenview'
+
+    def __init__(self, txtfilename):
+        folder = os.path.dirname(txtfilename)
+        if folder and not os.path.exists(folder):
+            os.makedirs(folder)
+
+        # the panoramas with a valid green view from a previous run are not
+        # computed again, the failed ones are
+        self.done = set()
+        if os.path.exists(txtfilename):
+            from .Greenview2Shp import read_green_views
+            self.done = set(read_green_views(txtfilename))
+        self.txtfile = open(txtfilename, 'a')
+
+    def write(self, pano):
+        from .GreenViewCalc import format_result_line
+        lineTxt = format_result_line(pano['panoID'], pano['panoDate'], pano['lon'], pano['lat'],
+                                     pano['greenView'])
+        self.txtfile.write(lineTxt)
+        self.txtfile.flush()
+
+    def close(self):
+        self.txtfile.close()
+
+
+class GreenViewShpSink(object):
+    '''
+    Write the green view results in a point shapefile, with the fields of the
+    shapefile created by Greenview2Shp. The panoramas without a valid green
+    view are skipped, as done by Greenview2Shp.
+    '''
+
+    stage = 'greenview'
+
+    def __init__(self, outputShapefile, lyrname='greenView'):
+        from osgeo import ogr
+        from osgeo import osr
+
+        self.ogr = ogr
+        driver = ogr.GetDriverByName("ESRI Shapefile")
+        if os.path.exists(outputShapefile):
+            driver.DeleteDataSource(outputShapefile)
+
+        self.data_source = driver.CreateDataSource(outputShapefile)
+        targetSpatialRef = osr.SpatialReference()
+        targetSpatialRef.ImportFromEPSG(4326)
+
+        self.outLayer = self.data_source.CreateLayer(lyrname, targetSpatialRef, ogr.wkbPoint)
+        self.outLayer.CreateField(ogr.FieldDefn('PntNum', ogr.OFTInteger))
+        self.outLayer.CreateField(ogr.FieldDefn('panoID', ogr.OFTString))
+        self.outLayer.CreateField(ogr.FieldDefn('panoDate', ogr.OFTString))
+        self.outLayer.CreateField(ogr.FieldDefn('greenView', ogr.OFTReal))
+        self.numPnt = 0
+
+    def write(self, pano):
+        if pano['greenView'] < 0:
+            return
+
+        point = self.ogr.Geometry(self.ogr.wkbPoint)
+        point.AddPoint(float(pano['lon']), float(pano['lat']))
+
+        outFeature = self.ogr.Feature(self.outLayer.GetLayerDefn())
+        outFeature.SetGeometry(point)
+        outFeature.SetField('PntNum', self.numPnt)
+        outFeature.SetField('panoID', pano['panoID'])
+        outFeature.SetField('panoDate', pano['panoDate'])
+        outFeature.SetField('greenView', float(pano['greenView']))
+        self.outLayer.CreateFeature(outFeature)
+        outFeature.Destroy()
+        self.numPnt = self.numPnt + 1
+
+    def close(self):
+        self.data_source.Destroy()
+
+
+def streamGreenView(
+        inshp,
+        mini_dist,
+        greenmonth,
+        sinks,
+        metadataWorkers=4,
+        downloadWorkers=4,
+        queueSize=16):
+    '''
+    This function is used to compute the green view index of the street network
+    as a stream, from the street shapefile to the sinks. The sample points are
+    created along the streets, the metadata of their panoramas are collected by
+    metadataWorkers threads, the panoramas not in a green month and the
+    duplicated panoramas are dropped, the images are downloaded by
+    downloadWorkers threads, and classified in the calling thread.
+
+    Parameters:
+        inshp: the input linear shapefile, must be in WGS84 projection, ESPG: 4326
+        mini_dist: the minimum distance between two created point
+        greenmonth: a list of the green season, greenmonth = ['05','06','07','08','09']
+        sinks: the outputs, MetadataTxtSink, GreenViewTxtSink or GreenViewShpSink
+        metadataWorkers: the number of threads requesting the GSV metadata
+        downloadWorkers: the number of threads downloading the GSV images
+        queueSize: the maximum number of items waiting between two steps
+
+    Return:
+        the number of panoramas processed
+    '''
+
+    from .createPoints import iter_points
+    from .metadataCollector import get_pano_metadata, get_keys
+    from .GreenViewCalc import retreive_pano_images, compute_pano_green_view
+    from .GreenViewCalc import HEADINGS, PITCH, FAILED_GREEN_VIEW
+    from .panorama import PanoramaHeadingError
+
+    key = get_keys()
+    metadataSinks = [sink for sink in sinks if sink.stage == 'metadata']
+    greenViewSinks = [sink for sink in sinks if sink.stage == 'greenview']
+
+    # the panoramas already computed by a previous run
+    donePanos = set()
+    for sink in greenViewSinks:
+        donePanos.update(getattr(sink, 'done', ()))
+
+    def collect_metadata(point):
+        # the points are in WGS84, x is the longitude, a failed request only
+        # loses this point
+        try:
+            panoItems = get_pano_metadata(point.y, point.x, key, greenmonth)
+        except (KeyboardInterrupt, SystemExit):
+            raise
+        except BaseException:
+            print("Unexpected error:", sys.exc_info())
+            return None
+        if panoItems is None:
+            return None
+
+        panoDate, panoId, panoLat, panoLon = panoItems
+        return {'panoID': panoId, 'panoDate': panoDate,
+                'lon': panoLon, 'lat': panoLat}
+
+    def green_panos(panos):
+        # same selection as get_pano_lists_from_file, only the green months
+        # and every panorama once
+        seenPanos = set()
+        for pano in panos:
+            if pano['panoDate'] is None or pano['panoDate'][-2:] not in greenmonth:
+                continue
+            if pano['panoID'] in seenPanos:
+                continue
+            seenPanos.add(pano['panoID'])
+
+            for sink in metadataSinks:
+                sink.write(pano)
+            if pano['panoID'] in donePanos:
+                continue
+            yield pano
+
+    def download(pano):
+        try:
+            pano['images'] = retreive_pano_images(pano['panoID'], HEADINGS, PITCH)
+        except PanoramaHeadingError:
+            raise
+        except BaseException:
+            print("Unexpected error:", sys.exc_info())
+            pano['images'] = None
+        return pano
+
+    points = iter_points(inshp, mini_dist)
+    panos = threaded_map(collect_metadata, points, metadataWorkers, queueSize)
+    downloaded = threaded_map(download, green_panos(panos), downloadWorkers, queueSize)
+
+    numPano = 0
+    try:
+        for pano in downloaded:
+            images = pano.pop('images')
+            if images is None:
+                pano['greenView'] = FAILED_GREEN_VIEW
+            else:
+                pano['greenView'] = compute_pano_green_view(pano['panoID'], images=images)
+            del images
+
+            print('The greenview: %s, pano: %s, (%s, %s)' % (
+                pano['greenView'], pano['panoID'], pano['lat'], pano['lon']))
+
+            for sink in greenViewSinks:
+                sink.write(pano)
+            numPano = numPano + 1
+    finally:
+        for sink in sinks:
+            sink.close()
+
+    return numPano
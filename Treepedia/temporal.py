@@ -0,0 +1,158 @@
+# This program is used to compute a time series of the green view index of the sample
+# points. The history of the panoramas captured at each sample point is listed by
+# streetview.panoids, for every year one panorama captured in a green month is kept.
+# Neighbouring sample points often share the same panoramas, so the panoramas are
+# de-duplicated over all the points and all the years, and the images of every
+# panorama are downloaded and classified only once.
+
+# The output is a txt file with one line per sample point and year:
+# pntID: 12 year: 2015 panoID: xxx panoDate: 2015-06 longitude: -4.3 latitude: 55.8, greenview: 23.4
+
+import os
+import os.path
+import sys
+
+
+def select_yearly_panos(panoLst, greenmonth):
+    '''
+    This function is used to select in the history of a site one panorama
+    captured in a green month per year, the latest one of the year.
+
+    Return:
+        a dictionary year: (panoDate, panoId, panoLat, panoLon)
+    '''
+
+    from .metadataCollector import sort_pano_list_by_date, get_pano_items_from_dict
+
+    greenmonth_int = [int(month) for month in greenmonth]
+    yearlyPanos = {}
+
+    # the panos without date are the neighbouring panoramas, not the history
+    for pano in sort_pano_list_by_date(panoLst):
+        if 'month' not in pano or 'year' not in pano:
+            continue
+        if pano['month'] not in greenmonth_int or pano['year'] in yearlyPanos:
+            continue
+        yearlyPanos[pano['year']] = get_pano_items_from_dict(pano)
+
+    return yearlyPanos
+
+
+def read_pano_history(historyTxt):
+    '''
+    Read the pano history txt file
+
+    Return:
+        a list of (pntID, year, panoID, panoDate, lon, lat)
+    '''
+
+    rows = []
+    with open(historyTxt, 'r') as lines:
+        for line in lines:
+            metadata = line.split()
+            if len(metadata) < 12:
+                continue
+            rows.append((int(metadata[1]), int(metadata[3]), metadata[5],
+                         metadata[7], metadata[9], metadata[11]))
+
+    return rows
+
+
+def collectPanoHistory(samplesShp, historyTxt, greenmonth):
+    '''
+    This function is used to collect the yearly green month panoramas of the
+    sample points, the sample points already in the history txt file are
+    skipped, so an interrupted run can be restarted.
+
+    Parameters:
+        samplesShp: the shapefile of the sample points, in WGS84
+        historyTxt: the output txt file of the pano history
+        greenmonth: a list of the green season, greenmonth = ['05','06','07','08','09']
+
+    '''
+
+    import fiona
+    import streetview
+
+    donePnts = set()
+    if os.path.exists(historyTxt):
+        donePnts = set(row[0] for row in read_pano_history(historyTxt))
+
+    with fiona.open(samplesShp) as source, open(historyTxt, 'a') as historyText:
+        for pntID, feat in enumerate(source):
+            if pntID in donePnts:
+                continue
+
+            lon, lat = feat['geometry']['coordinates'][:2]
+            try:
+                panoLst = streetview.panoids(lat=lat, lon=lon)
+            except BaseException:
+                print("Unexpected error:", sys.exc_info())
+                continue
+
+            yearlyPanos = select_yearly_panos(panoLst, greenmonth)
+            print('The point %s has panoramas for the years: %s' % (
+                pntID, sorted(yearlyPanos)))
+
+            for year in sorted(yearlyPanos):
+                panoDate, panoId, panoLat, panoLon = yearlyPanos[year]
+                lineTxt = 'pntID: %s year: %s panoID: %s panoDate: %s longitude: %s latitude: %s\n' % (
+                    pntID, year, panoId, panoDate, panoLon, panoLat)
+                historyText.write(lineTxt)
+
+
+def computeTemporalGreenView(historyTxt, panoGreenViewTxt, outputTxt):
+    '''
+    This function is used to compute the green view index of every unique
+    panorama of the pano history, and to write the green view of every
+    sample point and year. The green view of the panoramas are saved in
+    panoGreenViewTxt, with the format of the output of GreenViewCalc, the
+    panoramas already there are not computed again.
+
+    Parameters:
+        historyTxt: the pano history txt file, created by collectPanoHistory
+        panoGreenViewTxt: the green view txt file of the unique panoramas
+        outputTxt: the output txt file, one line per sample point and year
+
+    Return:
+        the number of unique panoramas and the number of point and year rows
+    '''
+
+    from .GreenViewCalc import compute_pano_green_view, format_result_line
+    from .Greenview2Shp import read_green_views
+
+    rows = read_pano_history(historyTxt)
+
+    # the green view already computed
+    panoGreenView = {}
+    if os.path.exists(panoGreenViewTxt):
+        panoGreenView = read_green_views(panoGreenViewTxt)
+
+    with open(panoGreenViewTxt, 'a') as gvResTxt:
+        for pntID, year, panoID, panoDate, lon, lat in rows:
+            if panoID in panoGreenView:
+                continue
+
+            greenViewVal = compute_pano_green_view(panoID)
+            panoGreenView[panoID] = greenViewVal
+            print('The greenview: %s, pano: %s, (%s, %s)' % (greenViewVal, panoID, lat, lon))
+
+            gvResTxt.write(format_result_line(panoID, panoDate, lon, lat, greenViewVal))
+            gvResTxt.flush()
+
+    numRows = 0
+    with open(outputTxt, 'w') as outputText:
+        for pntID, year, panoID, panoDate, lon, lat in rows:
+            greenViewVal = panoGreenView[panoID]
+            if greenViewVal < 0:
+                continue
+
+            lineTxt = 'pntID: %s year: %s ' % (pntID, year) + format_result_line(
+                panoID, panoDate, lon, lat, greenViewVal)
+            outputText.write(lineTxt)
+            numRows = numRows + 1
+
+    print('The number of unique panoramas is: %s, for %s point and year rows' % (
+        len(panoGreenView), numRows))
+
+    return len(panoGreenView), numRows
@@ -0,0 +1,361 @@
+# This program is used to run the Treepedia workflow on street networks that are too
+# large to be processed at once, like the network of a whole country. The input network
+# is split into spatial tiles, the stages 1-3 are run per tile, and the green view results
+# of all the tiles are finally merged into a single result txt file.
+
+# The tiles are square boxes in the pseudo mercator projection (EPSG:3857), the same
+# projection used by createPoints to space the sample points. Every tile has a core box
+# and a buffered box. The streets are selected and clipped with the buffered box, so
+# that the streets crossing the border are sampled on both sides, and then only the
+# sample points inside the core box are kept, every sample point therefore belongs to
+# exactly one tile. The GSV metadata api snaps every point to the closest panorama,
+# which can be on the other side of the border, hence the panoramas lying within the
+# buffer distance of a border are de-duplicated when merging the tile results.
+
+# Each tile is written in its own folder, with one marker file per finished stage,
+# so an interrupted run can be restarted and the tiles can be processed by several
+# processes at the same time.
+
+import collections
+import json
+import math
+import os
+import os.path
+
+
+EARTH_RADIUS = 6378137.0
+TILE_INDEX = 'tiles.json'
+MAX_OPEN_TILES = 256
+
+
+def lonlat_to_mercator(lon, lat):
+    # spherical pseudo mercator, EPSG:3857
+    x = math.radians(lon) * EARTH_RADIUS
+    y = math.log(math.tan(math.pi / 4 + math.radians(lat) / 2)) * EARTH_RADIUS
+    return x, y
+
+
+def mercator_to_lonlat(x, y):
+    lon = math.degrees(x / EARTH_RADIUS)
+    lat = math.degrees(2 * math.atan(math.exp(y / EARTH_RADIUS)) - math.pi / 2)
+    return lon, lat
+
+
+def expand_box(box, dist):
+    return [box[0] - dist, box[1] - dist, box[2] + dist, box[3] + dist]
+
+
+def box_to_lonlat(box):
+    # the mercator x only depends on the longitude and y on the latitude, so
+    # a mercator box is also a box in WGS84
+    minLon, minLat = mercator_to_lonlat(box[0], box[1])
+    maxLon, maxLat = mercator_to_lonlat(box[2], box[3])
+    return [minLon, minLat, maxLon, maxLat]
+
+
+def in_box(box, x, y):
+    # half open, a point on a shared border belongs to only one tile
+    return box[0] <= x < box[2] and box[1] <= y < box[3]
+
+
+def read_tile_index(tileRoot):
+    with open(os.path.join(tileRoot, TILE_INDEX), 'r') as indexFile:
+        return json.load(indexFile)
+
+
+def is_done(tileDir, stage):
+    return os.path.exists(os.path.join(tileDir, '.%s.done' % stage))
+
+
+def mark_done(tileDir, stage):
+    open(os.path.join(tileDir, '.%s.done' % stage), 'w').close()
+
+
+def createTiles(inshp, tileRoot, tileSize, buffer):
+    '''
+    This function is used to split the street network into tiles, the streets
+    of every tile are clipped with the buffered tile box and saved in the
+    folder of the tile. Only the tiles containing streets are kept. The list of
+    tiles is saved in the tiles.json index of the tile root folder.
+
+    Required modules: Fiona and Shapely
+
+    parameters:
+        inshp: the input linear shapefile, must be in WGS84 projection, ESPG: 4326
+        tileRoot: the output folder for the tiles
+        tileSize: the size of the side of the tiles in meters
+        buffer: the overlap buffer of the tiles in meters
+
+    '''
+
+    import fiona
+    from shapely.geometry import shape, mapping, box
+
+    if os.path.exists(os.path.join(tileRoot, TILE_INDEX)):
+        print("Tiles already exist")
+        return read_tile_index(tileRoot)
+
+    if not os.path.exists(tileRoot):
+        os.makedirs(tileRoot)
+
+    tiles = []
+    with fiona.open(inshp) as source:
+        minLon, minLat, maxLon, maxLat = source.bounds
+        minX, minY = lonlat_to_mercator(minLon, minLat)
+        maxX, maxY = lonlat_to_mercator(maxLon, maxLat)
+
+        nCols = max(1, int(math.ceil((maxX - minX) / tileSize)))
+        nRows = max(1, int(math.ceil((maxY - minY) / tileSize)))
+
+        # the streets are written as single linestrings, the clipping can
+        # split a street in several parts
+        schema = dict(source.schema)
+        schema['geometry'] = 'LineString'
+
+        # one pass over the streets, every street is clipped with the tiles
+        # its bounds overlap. The writers of the tiles are opened when the
+        # first street of the tile is found, at most MAX_OPEN_TILES at a time,
+        # the others are closed and opened again in append mode
+        writers = collections.OrderedDict()
+        counts = {}
+        cores = {}
+
+        def get_writer(tileId):
+            if tileId in writers:
+                writers.move_to_end(tileId)
+                return writers[tileId]
+
+            if len(writers) >= MAX_OPEN_TILES:
+                writers.popitem(last=False)[1].close()
+
+            tileDir = os.path.join(tileRoot, tileId)
+            streets = os.path.join(tileDir, 'streets.shp')
+            if tileId in counts:
+                dest = fiona.open(streets, 'a')
+            else:
+                os.makedirs(tileDir, exist_ok=True)
+                dest = fiona.open(streets, 'w', driver=source.driver,
+                                  crs=source.crs, schema=schema)
+                counts[tileId] = 0
+            writers[tileId] = dest
+            return dest
+
+        try:
+            for feat in source:
+                geom = shape(feat['geometry'])
+                if geom.is_empty:
+                    continue
+
+                x0, y0 = lonlat_to_mercator(*geom.bounds[:2])
+                x1, y1 = lonlat_to_mercator(*geom.bounds[2:])
+                col0 = max(0, int(math.floor((x0 - buffer - minX) / tileSize)))
+                col1 = min(nCols - 1, int(math.floor((x1 + buffer - minX) / tileSize)))
+                row0 = max(0, int(math.floor((y0 - buffer - minY) / tileSize)))
+                row1 = min(nRows - 1, int(math.floor((y1 + buffer - minY) / tileSize)))
+
+                for row in range(row0, row1 + 1):
+                    for col in range(col0, col1 + 1):
+                        core = [minX + col * tileSize, minY + row * tileSize,
+                                minX + (col + 1) * tileSize, minY + (row + 1) * tileSize]
+                        clipped = geom.intersection(box(*box_to_lonlat(expand_box(core, buffer))))
+                        if clipped.is_empty:
+                            continue
+
+                        if clipped.geom_type == 'LineString':
+                            parts = [clipped]
+                        else:
+                            parts = [g for g in getattr(clipped, 'geoms', [])
+                                     if g.geom_type == 'LineString']
+
+                        tileId = 'r%04d_c%04d' % (row, col)
+                        cores[tileId] = core
+                        for part in parts:
+                            get_writer(tileId).write({'geometry': mapping(part),
+                                                      'properties': feat['properties']})
+                            counts[tileId] = counts[tileId] + 1
+        finally:
+            for dest in writers.values():
+                dest.close()
+
+        for tileId in sorted(counts):
+            tiles.append({'id': tileId, 'core': cores[tileId], 'streets': counts[tileId]})
+            print('Tile %s, number of streets: %s' % (tileId, counts[tileId]))
+
+    # hand the tiles out along the Hilbert curve, consecutive tiles are
+    # neighbours
+    from .ordering import curve_order
+    centers = [((t['core'][0] + t['core'][2]) / 2, (t['core'][1] + t['core'][3]) / 2) for t in tiles]
+    tiles = [tiles[i] for i in curve_order([c[0] for c in centers], [c[1] for c in centers])]
+
+    index = {'tileSize': tileSize, 'buffer': buffer, 'tiles': tiles}
+    with open(os.path.join(tileRoot, TILE_INDEX), 'w') as indexFile:
+        json.dump(index, indexFile, indent=1)
+
+    return index
+
+
+def keep_core_points(inshp, outshp, core):
+    '''
+    Copy the sample points lying inside the core box of the tile, return the
+    number of points kept
+    '''
+
+    import fiona
+
+    count = 0
+    with fiona.open(inshp) as source, fiona.open(outshp, 'w', driver=source.driver, crs=source.crs, schema=source.schema) as dest:
+        for feat in source:
+            lon, lat = feat['geometry']['coordinates'][:2]
+            x, y = lonlat_to_mercator(lon, lat)
+            if in_box(core, x, y):
+                feat['properties']['id'] = count
+                dest.write(feat)
+                count = count + 1
+
+    return count
+
+
+def processTile(tileRoot, tile, mini_dist, num, greenmonth):
+    '''
+    This function is used to run the stages 1-3 on one tile, the stages already
+    finished for the tile are skipped
+
+    parameters:
+        tileRoot: the folder of the tiles
+        tile: the tile item of the tiles.json index
+        mini_dist: the minimum distance between two created point
+        num: the number of sites in each metadata txt file
+        greenmonth: a list of the green season, greenmonth = ['05','06','07','08','09']
+
+    '''
+
+    from .createPoints import createPoints
+    from .metadataCollector import GSVpanoMetadataCollector
+    from .GreenViewCalc import GreenViewComputing_ogr_6Horizon
+    from .ordering import orderPoints
+
+    tileDir = os.path.join(tileRoot, tile['id'])
+    streets = os.path.join(tileDir, 'streets.shp')
+    allPoints = os.path.join(tileDir, 'points_all.shp')
+    corePoints = os.path.join(tileDir, 'points_core.shp')
+    points = os.path.join(tileDir, 'points.shp')
+    metadataFolder = os.path.join(tileDir, 'metadata')
+    greenViewFolder = os.path.join(tileDir, 'greenViewRes')
+
+    if not is_done(tileDir, 'points'):
+        createPoints(streets, allPoints, mini_dist)
+        numPnt = keep_core_points(allPoints, corePoints, tile['core'])
+        # compact metadata batches
+        orderPoints(corePoints, points)
+        with open(os.path.join(tileDir, '.points.done'), 'w') as doneFile:
+            doneFile.write(str(numPnt))
+
+    with open(os.path.join(tileDir, '.points.done'), 'r') as doneFile:
+        numPnt = int(doneFile.read() or 0)
+
+    # all the streets of the tile can be in the buffer zone
+    if numPnt == 0:
+        print('Tile %s has no sample points' % tile['id'])
+        return tile['id']
+
+    if not is_done(tileDir, 'metadata'):
+        GSVpanoMetadataCollector(
+            points, num, metadataFolder, greenmonth)
+        mark_done(tileDir, 'metadata')
+
+    if not is_done(tileDir, 'greenview'):
+        GreenViewComputing_ogr_6Horizon(
+            metadataFolder, greenViewFolder, greenmonth)
+        mark_done(tileDir, 'greenview')
+
+    return tile['id']
+
+
+def _process_tile_job(job):
+    return processTile(*job)
+
+
+def runTiles(tileRoot, mini_dist, num, greenmonth, processes=1):
+    '''
+    This function is used to run the stages 1-3 on all the tiles of the tile
+    index, the tiles are distributed on several processes if processes > 1
+    '''
+
+    index = read_tile_index(tileRoot)
+    jobs = [(tileRoot, tile, mini_dist, num, greenmonth)
+            for tile in index['tiles']]
+
+    if processes > 1:
+        from multiprocessing import Pool
+
+        with Pool(processes) as pool:
+            for tileId in pool.imap_unordered(_process_tile_job, jobs):
+                print('Tile %s done' % tileId)
+    else:
+        for job in jobs:
+            print('Tile %s done' % _process_tile_job(job))
+
+
+def mergeTiles(tileRoot, outputTxt):
+    '''
+    This function is used to merge the green view results of all tiles in a
+    single txt file, with the same format as the output of the stage 3.
+
+    A panorama lying further than the buffer distance from the border of its
+    tile can only be found by the sample points of this tile, the other
+    panoramas are de-duplicated with the panoramas of all the tiles, so the
+    memory used only grows with the length of the tile borders.
+
+    parameters:
+        tileRoot: the folder of the tiles
+        outputTxt: the merged green view result txt file
+
+    '''
+
+    from .Greenview2Shp import Read_GSVinfo_Text
+    from .GreenViewCalc import format_result_line
+
+    index = read_tile_index(tileRoot)
+    buffer = index['buffer']
+    borderPanos = set()
+    numPano = 0
+
+    outputFolder = os.path.dirname(outputTxt)
+    if outputFolder and not os.path.exists(outputFolder):
+        os.makedirs(outputFolder)
+
+    with open(outputTxt, 'w') as gvResTxt:
+        for tile in index['tiles']:
+            greenViewFolder = os.path.join(tileRoot, tile['id'], 'greenViewRes')
+            if not is_done(os.path.join(tileRoot, tile['id']), 'greenview'):
+                continue
+
+            inner = expand_box(tile['core'], -buffer)
+            tilePanos = set()
+
+            for txtfile in sorted(os.listdir(greenViewFolder)):
+                if not txtfile.endswith('.txt'):
+                    continue
+
+                [panoIDLst, panoDateLst, panoLonLst, panoLatLst,
+                    greenViewLst] = Read_GSVinfo_Text(os.path.join(greenViewFolder, txtfile))
+
+                for i in range(len(panoIDLst)):
+                    panoID = panoIDLst[i]
+                    x, y = lonlat_to_mercator(float(panoLonLst[i]), float(panoLatLst[i]))
+
+                    if in_box(inner, x, y):
+                        seen = tilePanos
+                    else:
+                        seen = borderPanos
+
+                    if panoID in seen:
+                        continue
+                    seen.add(panoID)
+
+                    lineTxt = format_result_line(
+                        panoID, panoDateLst[i], panoLonLst[i], panoLatLst[i], greenViewLst[i].strip())
+                    gvResTxt.write(lineTxt)
+                    numPano = numPano + 1
+
+    print('The number of merged panoramas is:', numPano)